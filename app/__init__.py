@@ -78,7 +78,7 @@ def register_blueprints(app):
     from app.routes.auth import auth_bp
     from app.routes.user import user_bp
     from app.routes.dashboard import dashboard_bp
-    from app.routes.weekly_planning import weekly_planning_bp
+    from app.routes.weekly_planning import weekly_planning_bp, limiter as weekly_planning_limiter
     from app.routes.content_generation import content_generation_bp
     from app.routes.websocket_api import websocket_api_bp
     from app.routes.file_management_simple import file_management_bp
@@ -95,6 +95,7 @@ def register_blueprints(app):
     app.register_blueprint(user_bp, url_prefix='/api/v1/user')
     app.register_blueprint(dashboard_bp, url_prefix='/api/v1/dashboard')
     app.register_blueprint(weekly_planning_bp)  # Already has /api/v1/weekly-planning prefix
+    weekly_planning_limiter.init_app(app)  # Route limits on the weekly planning blueprint
     app.register_blueprint(content_generation_bp)  # Already has /api/content prefix
     app.register_blueprint(websocket_api_bp)
     app.register_blueprint(file_management_bp, url_prefix='/api/v1')
@@ -41,9 +41,17 @@ class Config:
     # Redis
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Rate limiting (read by Flask-Limiter); counters live in Redis so limits hold across workers
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or REDIS_URL
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY') or 'moving-window'
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    
     # AI Platform (legacy support)
     AI_PLATFORM_LOCATION = os.environ.get('AI_PLATFORM_LOCATION') or 'asia-south1'
     
+    # WebSocket server concurrency: 'threading', 'eventlet' or 'gevent'
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or 'threading'
+    
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
     
@@ -79,6 +87,7 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     ENV = 'testing'
+    RATELIMIT_STORAGE_URI = 'memory://'
 
 # Configuration mapping
 config = {
@@ -3,11 +3,16 @@ WebSocket Models
 Data models for real-time communication and collaboration.
 """
 
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any, Union
+from typing import Deque, Dict, List, Optional, Any, Union, Set
 from datetime import datetime
 from enum import Enum
 import json
+import time
+
+# Number of recent room changes kept for incremental session state responses
+ROOM_CHANGE_LOG_SIZE = 256
 
 class MessageType(Enum):
     """Types of real-time messages."""
@@ -84,6 +89,43 @@ class WebSocketUser:
             'metadata': self.metadata
         }
 
+@dataclass(slots=True)
+class UserSession:
+    """Authenticated user data held for the lifetime of a socket connection."""
+    user_id: str
+    username: str = ''
+    name: str = ''
+    email: str = ''
+    role: str = 'user'
+    session_id: str = ''
+    permissions: List[str] = field(default_factory=list)
+    joined_rooms: Set[str] = field(default_factory=set)
+    
+    @classmethod
+    def from_user_data(cls, user_data: Dict[str, Any]) -> 'UserSession':
+        """Create from an authentication user_data dict, ignoring unknown keys."""
+        return cls(
+            user_id=user_data['user_id'],
+            username=user_data.get('username') or '',
+            name=user_data.get('name') or '',
+            email=user_data.get('email') or '',
+            role=user_data.get('role') or 'user',
+            session_id=user_data.get('session_id') or '',
+            permissions=list(user_data.get('permissions') or [])
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            'user_id': self.user_id,
+            'username': self.username,
+            'name': self.name,
+            'email': self.email,
+            'role': self.role,
+            'session_id': self.session_id,
+            'permissions': self.permissions
+        }
+
 @dataclass
 class ChatMessage:
     """Represents a chat message."""
@@ -130,7 +172,7 @@ class TypingIndicator:
             'started_at': self.started_at.isoformat()
         }
 
-@dataclass
+@dataclass(slots=True)
 class CursorPosition:
     """Represents user cursor position in collaborative editing."""
     user_id: str
@@ -140,7 +182,12 @@ class CursorPosition:
     element_id: Optional[str] = None
     selection_start: Optional[int] = None
     selection_end: Optional[int] = None
-    timestamp: datetime = field(default_factory=datetime.utcnow)
+    ts: float = field(default_factory=time.time)  # epoch seconds
+    
+    def to_tuple(self) -> tuple:
+        """Convert to a packed tuple ordered as CURSOR_TUPLE_FIELDS."""
+        return (self.user_id, self.x, self.y, self.element_id,
+                self.selection_start, self.selection_end, self.ts)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
@@ -152,9 +199,12 @@ class CursorPosition:
             'element_id': self.element_id,
             'selection_start': self.selection_start,
             'selection_end': self.selection_end,
-            'timestamp': self.timestamp.isoformat()
+            'timestamp': datetime.utcfromtimestamp(self.ts).isoformat()
         }
 
+# Field order of CursorPosition.to_tuple(), sent alongside packed cursor lists
+CURSOR_TUPLE_FIELDS = ('user_id', 'x', 'y', 'element_id', 'selection_start', 'selection_end', 'ts')
+
 @dataclass
 class PlanUpdate:
     """Represents a plan update in collaborative planning."""
@@ -180,6 +230,25 @@ class PlanUpdate:
             'timestamp': self.timestamp.isoformat()
         }
 
+@dataclass(slots=True)
+class LockEntry:
+    """Exclusive edit lock held on a room resource."""
+    user_id: str
+    user_name: str
+    locked_at: float = field(default_factory=time.time)  # epoch seconds
+    
+    def locked_at_iso(self) -> str:
+        """Get the lock time as an ISO 8601 string."""
+        return datetime.utcfromtimestamp(self.locked_at).isoformat()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            'user_id': self.user_id,
+            'user_name': self.user_name,
+            'locked_at': self.locked_at_iso()
+        }
+
 @dataclass
 class Room:
     """Represents a collaboration room."""
@@ -193,12 +262,17 @@ class Room:
     cursor_positions: Dict[str, CursorPosition] = field(default_factory=dict)
     settings: Dict[str, Any] = field(default_factory=dict)
     permissions: Dict[str, List[str]] = field(default_factory=dict)  # user_id -> permissions
+    resource_locks: Dict[str, LockEntry] = field(default_factory=dict)  # 'type:id' -> lock
+    version: int = 0
+    change_log: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=ROOM_CHANGE_LOG_SIZE))
+    _dict_cache: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)  # (version, dict)
     
     def add_user(self, user: WebSocketUser) -> None:
         """Add user to room."""
         self.active_users[user.user_id] = user
         if self.id not in user.rooms:
             user.rooms.append(self.id)
+        self.record_change('user_joined', user.user_id, user.to_dict())
     
     def remove_user(self, user_id: str) -> Optional[WebSocketUser]:
         """Remove user from room."""
@@ -208,8 +282,50 @@ class Room:
         # Clean up user-specific data
         self.typing_users.pop(user_id, None)
         self.cursor_positions.pop(user_id, None)
+        if user:
+            self.record_change('user_left', user_id)
         return user
     
+    def record_change(self, change_type: str, key: str, value: Any = None) -> int:
+        """
+        Bump the room version and append a change to the change log.
+        
+        Args:
+            change_type: Kind of change (e.g. 'user_joined', 'resource_locked')
+            key: Identifier of the changed entity
+            value: New value, or None for removals
+            
+        Returns:
+            The new room version
+        """
+        self.version += 1
+        self.change_log.append({
+            'version': self.version,
+            'type': change_type,
+            'key': key,
+            'value': value
+        })
+        return self.version
+    
+    def changes_since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the changes made after a given version.
+        
+        Args:
+            version: Last version seen by the client
+            
+        Returns:
+            List of changes in order, or None if the log no longer covers
+            that version and a full snapshot is needed
+        """
+        if version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self.change_log or self.change_log[0]['version'] > version + 1:
+            return None
+        return [change for change in self.change_log if change['version'] > version]
+    
     def get_user_count(self) -> int:
         """Get number of active users."""
         return len(self.active_users)
@@ -231,6 +347,17 @@ class Room:
             'user_count': self.get_user_count(),
             'settings': self.settings
         }
+    
+    def cached_dict(self) -> Dict[str, Any]:
+        """
+        Get to_dict() output, rebuilt only after the room version changes.
+        
+        The returned dict is shared between callers and must not be modified.
+        """
+        cache = self._dict_cache
+        if cache is None or cache[0] != self.version:
+            cache = self._dict_cache = (self.version, self.to_dict())
+        return cache[1]
 
 @dataclass
 class WebSocketEvent:
@@ -333,3 +460,37 @@ class RateLimitInfo:
             'window_start': self.window_start.isoformat(),
             'blocked_until': self.blocked_until.isoformat() if self.blocked_until else None
         }
+
+# Fixed-shape acknowledgement payloads. The orjson Socket.IO codec encodes
+# slotted dataclasses natively, so these are emitted as-is without a dict.
+
+@dataclass(slots=True)
+class PlanUpdateAck:
+    """Payload of plan_update_queued and plan_update_processed."""
+    session_id: str
+    operation: str
+    target_type: str
+    target_id: str
+    timestamp: str
+
+@dataclass(slots=True)
+class ActivityDragAck:
+    """Payload of activity_drag_processed."""
+    session_id: str
+    activity_id: str
+    from_position: Dict[str, Any]
+    to_position: Dict[str, Any]
+    timestamp: str
+
+@dataclass(slots=True)
+class ResourceLockAck:
+    """Payload of resource_locked."""
+    resource_type: str
+    resource_id: str
+    locked_at: str
+
+@dataclass(slots=True)
+class ResourceUnlockAck:
+    """Payload of resource_unlocked."""
+    resource_type: str
+    resource_id: str
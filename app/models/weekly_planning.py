@@ -39,7 +39,7 @@ class ConflictType(Enum):
     DURATION_EXCEEDED = "duration_exceeded"
     BREAK_VIOLATED = "break_violated"
 
-@dataclass
+@dataclass(slots=True)
 class LessonActivity:
     """Individual lesson activity within a day plan."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -104,7 +104,7 @@ class LessonActivity:
             
         return activity
 
-@dataclass
+@dataclass(slots=True)
 class DayPlan:
     """Plan for a single day containing activities and notes."""
     date: date = field(default_factory=date.today)
@@ -151,7 +151,7 @@ class DayPlan:
         day_plan.break_times = data.get('breakTimes', [])
         return day_plan
 
-@dataclass
+@dataclass(slots=True)
 class WeeklyPlan:
     """Weekly lesson plan containing multiple day plans."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -182,6 +182,9 @@ class WeeklyPlan:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization."""
+        # Each day computes its duration once; reuse it for the weekly total
+        day_dicts = [day.to_dict() for day in self.day_plans]
+        self.total_hours = sum(day['totalDuration'] for day in day_dicts) / 60.0
         return {
             'id': self.id,
             'weekStart': self.week_start.isoformat(),
@@ -189,7 +192,7 @@ class WeeklyPlan:
             'title': self.title,
             'description': self.description,
             'targetGrades': self.target_grades,
-            'dayPlans': [day.to_dict() for day in self.day_plans],
+            'dayPlans': day_dicts,
             'isTemplate': self.is_template,
             'templateCategory': self.template_category.value if self.template_category else None,
             'userId': self.user_id,
@@ -197,7 +200,7 @@ class WeeklyPlan:
             'updatedAt': self.updated_at.isoformat() + 'Z' if self.updated_at else None,
             'tags': self.tags,
             'subjects': self.subjects,
-            'totalHours': self.calculate_total_hours()
+            'totalHours': self.total_hours
         }
     
     @classmethod
@@ -232,7 +235,7 @@ class WeeklyPlan:
             
         return plan
 
-@dataclass
+@dataclass(slots=True)
 class ActivityTemplate:
     """Template for lesson activities that can be reused."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -302,7 +305,7 @@ class ActivityTemplate:
             
         return template
 
-@dataclass
+@dataclass(slots=True)
 class ScheduleConflict:
     """Represents a scheduling conflict in a weekly plan."""
     type: ConflictType
@@ -323,7 +326,7 @@ class ScheduleConflict:
             'suggestedResolution': self.suggested_resolution
         }
 
-@dataclass
+@dataclass(slots=True)
 class PlanSummary:
     """Summary statistics for a weekly plan."""
     total_activities: int = 0
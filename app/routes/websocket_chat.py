@@ -3,16 +3,27 @@ WebSocket Chat Routes
 Real-time chat features with WebSocket support including intelligent AI responses.
 """
 
+import atexit
 import logging
+import operator
+import queue
+import sys
+import threading
+import time
 import uuid
 import asyncio
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
-from flask import request
+from flask import request, session
 from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
+from socketio import packet as sio_packet
 
-from app.models.websocket_models import MessageType, EventType, RoomType
+from app.models.websocket_models import MessageType, EventType, RoomType, UserSession
 from app.models.chat import ChatSessionType
 from app.services.websocket_manager import WebSocketManager
 from app.services.intelligent_chat_service import IntelligentChatService
@@ -20,208 +31,552 @@ from app.utils.simple_websocket_auth import SimpleWebSocketAuth, require_ws_auth
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def _warn_once(message: str) -> None:
+    """Log a warning the first time a given message comes up in this process."""
+    logger.warning(message)
+
+# Background listener that drains queued WebSocket log records to the root handlers
+_log_listener: Optional[QueueListener] = None
+
+class _RootForwardHandler(logging.Handler):
+    """Pass drained records to whatever handlers the root logger has at that moment."""
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger().handle(record)
+
+def _enable_queued_logging(*logger_names: str) -> None:
+    """
+    Route the given loggers through a queue so event handlers never block on log I/O.
+    
+    The loggers stop propagating so records are not written twice; the listener
+    hands them to the root logger's handlers as they are drained, so handlers
+    added later (Gunicorn, test log capture) still receive them. Handlers on
+    intermediate loggers such as 'app' are bypassed. Records still queued at
+    interpreter exit are flushed by stopping the listener.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(log_queue, _RootForwardHandler())
+    for name in logger_names:
+        queued_logger = logging.getLogger(name)
+        queued_logger.addHandler(QueueHandler(log_queue))
+        queued_logger.propagate = False
+    _log_listener.start()
+    atexit.register(_stop_queued_logging)
+
+def _stop_queued_logging() -> None:
+    """Flush records still in the log queue and stop the listener thread."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+# Chat message types by wire value
+_MSG_TYPES = {message_type.value: message_type for message_type in MessageType}
+
+# Serializes a model instance via its to_dict() method
+_TO_DICT = operator.methodcaller('to_dict')
+
+class _EncodedPacket(sio_packet.Packet):
+    """Socket.IO event packet whose wire encoding is computed once and reused."""
+    
+    def __init__(self, namespace: str, event: str, payload: Dict[str, Any]):
+        super().__init__(sio_packet.EVENT, data=[event, payload], namespace=namespace)
+        self._encoded = super().encode()
+    
+    def encode(self):
+        return self._encoded
+
+# Static error responses sent to clients: key -> (message, code)
+_ERRORS = {
+    'MISSING_ROOM_ID': ('Room ID required', 'MISSING_ROOM_ID'),
+    'TYPING_FAILED': ('Failed to update typing status', 'TYPING_FAILED'),
+    'INVALID_ORIGIN': ('Invalid origin', 'INVALID_ORIGIN'),
+    'RATE_LIMIT': ('Rate limit exceeded', 'RATE_LIMIT'),
+    'CONNECTION_ERROR': ('Connection failed', 'CONNECTION_ERROR'),
+    'ACCESS_DENIED': ('Access denied to room', 'ACCESS_DENIED'),
+    'ROOM_NOT_FOUND': ('Room not found', 'ROOM_NOT_FOUND'),
+    'JOIN_FAILED': ('Failed to join room', 'JOIN_FAILED'),
+    'JOIN_ERROR': ('Failed to join room', 'JOIN_ERROR'),
+    'LEAVE_FAILED': ('Failed to leave room', 'LEAVE_FAILED'),
+    'LEAVE_ERROR': ('Failed to leave room', 'LEAVE_ERROR'),
+    'MISSING_MESSAGE_DATA': ('Room ID and content required', 'MISSING_DATA'),
+    'INVALID_TYPE': ('Invalid message type', 'INVALID_TYPE'),
+    'MESSAGE_TOO_LONG': ('Message too long (max 2000 characters)', 'MESSAGE_TOO_LONG'),
+    'NO_WRITE_PERMISSION': ('No write permission for room', 'NO_WRITE_PERMISSION'),
+    'SEND_FAILED': ('Failed to send message', 'SEND_FAILED'),
+    'SEND_ERROR': ('Failed to send message', 'SEND_ERROR'),
+    'MISSING_SESSION_DATA': ('Message content and session ID required', 'MISSING_DATA'),
+    'INTELLIGENT_MESSAGE_ERROR': ('Failed to process intelligent message', 'INTELLIGENT_MESSAGE_ERROR'),
+    'AUTH_REQUIRED': ('Authentication required', 'AUTH_REQUIRED'),
+    'INVALID_AUTH': ('Invalid user authentication', 'INVALID_AUTH'),
+    'SESSION_CREATE_FAILED': ('Failed to create session', 'SESSION_CREATE_FAILED'),
+    'SESSION_CREATE_ERROR': ('Failed to create session', 'SESSION_CREATE_ERROR'),
+    'MISSING_SESSION_ID': ('Session ID required', 'MISSING_SESSION_ID'),
+    'HISTORY_ERROR': ('Failed to get session history', 'HISTORY_ERROR'),
+    'SUGGESTIONS_ERROR': ('Failed to get suggestions', 'SUGGESTIONS_ERROR'),
+    'MISSING_VOICE_DATA': ('Room ID and status required', 'MISSING_DATA'),
+    'VOICE_STATUS_FAILED': ('Failed to update voice status', 'VOICE_STATUS_FAILED'),
+    'ROOM_INFO_ERROR': ('Failed to get room info', 'ROOM_INFO_ERROR'),
+    'INTERNAL': ('Internal error', 'INTERNAL'),
+    'BACKPRESSURE': ('Too many pending messages, retry shortly', 'BACKPRESSURE'),
+}
+_ERROR_PAYLOADS = {key: {'message': message, 'code': code} for key, (message, code) in _ERRORS.items()}
+_ERROR_PACKETS = {key: _EncodedPacket('/ws/chat', 'error', payload) for key, payload in _ERROR_PAYLOADS.items()}
+
+# ISO timestamp for the current UTC second: [epoch_second, iso_string]
+_iso_cache: List[Any] = [0, '']
+
+def _iso_now() -> str:
+    """Get the current UTC time as a second-resolution ISO string, formatted once per second."""
+    now = int(time.time())
+    if now != _iso_cache[0]:
+        _iso_cache[1] = datetime.utcfromtimestamp(now).isoformat()
+        _iso_cache[0] = now
+    return _iso_cache[1]
+
+def _room_id(data: Dict[str, Any]) -> str:
+    """Get the payload's room ID as an interned str, or '' if missing."""
+    room_id = data.get('room_id')
+    # Clients may send numeric IDs; interning lets repeated dict lookups hit on identity
+    return sys.intern(str(room_id)) if room_id else ''
+
+def _extract_message(data: Dict[str, Any]) -> str:
+    """Get the stripped message text from a payload's 'message' or 'content' field."""
+    for key in ('message', 'content'):
+        value = data.get(key)
+        if isinstance(value, str):
+            value = value.strip()
+            if value:
+                return value
+    return ''
+
 class ChatSocketHandler:
     """Handles WebSocket events for chat functionality with intelligent AI responses."""
     
+    # Seconds between flushes of buffered connection log entries
+    CONNECTION_LOG_FLUSH_INTERVAL = 0.5
+    
+    # Seconds a user's available room list is reused across connects
+    ROOM_LIST_CACHE_TTL = 30
+    ROOM_LIST_CACHE_SIZE = 10000
+    
+    # Seconds a room permission result is reused for the same socket
+    PERMISSION_CACHE_TTL = 30
+    
+    # Outgoing packets queued for a socket beyond which non-critical emits are shed
+    BACKPRESSURE_LIMIT = 64
+    
+    # Distinct connection origins whose validation result is remembered
+    ORIGIN_CACHE_SIZE = 64
+    
+    # Maximum tracked socket sessions; the least recently connected is evicted beyond this
+    MAX_SESSIONS = 10000
+    
     def __init__(self, socketio: SocketIO, ws_manager: WebSocketManager):
         """Initialize chat socket handler."""
         self.socketio = socketio
         self.ws_manager = ws_manager
-        self.ws_auth = SimpleWebSocketAuth()
+        self.ws_auth = SimpleWebSocketAuth(buffer_connection_logs=True)
         self.intelligent_chat_service = IntelligentChatService()
         
-        # Session storage for socket connections
-        self.user_sessions = {}
+        # Session storage for socket connections, oldest first
+        self.user_sessions: 'OrderedDict[str, UserSession]' = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        
+        # Available room lists per user: user_id -> (expires_at, rooms)
+        self._room_list_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        
+        # Room permission results per socket: sid -> {(room_id, permission): (allowed, checked_at)}
+        self._permission_cache: Dict[str, Dict[Tuple[str, str], Tuple[bool, float]]] = {}
+        
+        # Origin validation results: origin -> allowed
+        self._origin_cache: Dict[str, bool] = {}
+        
+        # Last applied typing state per socket: sid -> (room_id, is_typing)
+        self._typing_state: Dict[str, Tuple[str, bool]] = {}
+        
+        # Pre-encoded pong packet for the current second: (iso_timestamp, packet)
+        self._pong_packet: Tuple[str, Optional[_EncodedPacket]] = ('', None)
+        
+        # Per-thread buffer of (event, payload) emits while inside _cork()
+        self._cork_state = threading.local()
+        
+        # Keep log I/O off the connect/disconnect path
+        _enable_queued_logging(__name__, 'app.utils.simple_websocket_auth')
+        self.socketio.start_background_task(self._flush_connection_log_loop)
         
         # Register event handlers
         self._register_events()
     
+    def _flush_connection_log_loop(self):
+        """Periodically flush buffered connection log entries."""
+        while True:
+            self.socketio.sleep(self.CONNECTION_LOG_FLUSH_INTERVAL)
+            try:
+                self.ws_auth.flush_connection_log()
+            except Exception as e:
+                logger.error("Connection log flush error: %s", e)
+    
+    def _get_available_rooms(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get the user's room list, reusing a recent result when available."""
+        now = time.monotonic()
+        cached = self._room_list_cache.get(user_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        rooms = self.ws_manager.get_room_list(user_id)
+        if user_id not in self._room_list_cache and len(self._room_list_cache) >= self.ROOM_LIST_CACHE_SIZE:
+            self._room_list_cache.pop(next(iter(self._room_list_cache)))
+        self._room_list_cache[user_id] = (now + self.ROOM_LIST_CACHE_TTL, rooms)
+        return rooms
+    
+    def _is_origin_allowed(self, origin: str) -> bool:
+        """Validate a connection origin, remembering results for recently seen origins."""
+        allowed = self._origin_cache.get(origin)
+        if allowed is None:
+            allowed = self.ws_auth.validate_origin(origin)
+            if len(self._origin_cache) >= self.ORIGIN_CACHE_SIZE:
+                self._origin_cache.pop(next(iter(self._origin_cache)), None)
+            self._origin_cache[origin] = allowed
+        return allowed
+    
+    def _store_session(self, sid: str, user_data: Dict[str, Any]) -> None:
+        """Track a socket's user data, evicting the oldest sessions past MAX_SESSIONS."""
+        with self._sessions_lock:
+            self.user_sessions[sid] = UserSession.from_user_data(user_data)
+            self.user_sessions.move_to_end(sid)
+            evicted = []
+            while len(self.user_sessions) > self.MAX_SESSIONS:
+                evicted.append(self.user_sessions.popitem(last=False)[0])
+        
+        for evicted_sid in evicted:
+            logger.warning("Evicting stale chat session for socket %s", evicted_sid)
+            self._permission_cache.pop(evicted_sid, None)
+            self._typing_state.pop(evicted_sid, None)
+            self.ws_manager.remove_connection(evicted_sid)
+    
+    def _drop_session(self, sid: str) -> Optional[UserSession]:
+        """Stop tracking a socket and return its session, if any."""
+        self._permission_cache.pop(sid, None)
+        self._typing_state.pop(sid, None)
+        with self._sessions_lock:
+            return self.user_sessions.pop(sid, None)
+    
+    def _check_room_permission(self, user_data: Dict[str, Any], room_id: str, permission: str) -> bool:
+        """Check room permission, reusing the socket's recent result for the same room."""
+        now = time.monotonic()
+        socket_cache = self._permission_cache.setdefault(request.sid, {})
+        key = (room_id, permission)
+        cached = socket_cache.get(key)
+        if cached and now - cached[1] < self.PERMISSION_CACHE_TTL:
+            return cached[0]
+        
+        allowed = self.ws_auth.check_room_permission(user_data, room_id, permission)
+        socket_cache[key] = (allowed, now)
+        return allowed
+    
+    @contextmanager
+    def _cork(self):
+        """
+        Buffer emits made through _emit and flush them when the scope exits.
+        
+        A single buffered emit is sent unchanged; several are sent together as one
+        'batch' event carrying a list of {'event', 'data'} entries. Also usable as a
+        handler decorator (@self._cork()).
+        """
+        if getattr(self._cork_state, 'pending', None) is not None:
+            yield  # Nested scope; the outermost one flushes
+            return
+        
+        self._cork_state.pending = []
+        try:
+            yield
+        finally:
+            pending = self._cork_state.pending
+            self._cork_state.pending = None
+            if len(pending) == 1:
+                emit(*pending[0])
+            elif pending:
+                emit('batch', [{'event': event, 'data': payload} for event, payload in pending])
+    
+    def _emit(self, event: str, payload: Any) -> None:
+        """Emit to the current socket, deferring to the enclosing _cork() scope if any."""
+        pending = getattr(self._cork_state, 'pending', None)
+        if pending is None:
+            emit(event, payload)
+        else:
+            pending.append((event, payload))
+    
+    def _emit_error(self, key: str) -> None:
+        """Emit a static error from _ERRORS, sending its pre-encoded packet when not corked."""
+        pending = getattr(self._cork_state, 'pending', None)
+        if pending is None:
+            self._send_packet(_ERROR_PACKETS[key])
+        else:
+            pending.append(('error', _ERROR_PAYLOADS[key]))
+    
+    def _send_packet(self, pkt: sio_packet.Packet) -> None:
+        """
+        Send an already-built packet to the current socket, skipping emit's argument packing.
+        
+        Relies on python-socketio internals (Server._send_packet and
+        manager.eio_sid_from_sid, pinned in requirements.txt); if either is
+        missing the packet's event is sent with a plain emit() instead.
+        """
+        server = self.socketio.server
+        send_packet = getattr(server, '_send_packet', None)
+        eio_sid_from_sid = getattr(server.manager, 'eio_sid_from_sid', None)
+        if send_packet is None or eio_sid_from_sid is None:
+            _warn_once("python-socketio internals unavailable; sending packets with emit()")
+            emit(*pkt.data)
+            return
+        send_packet(eio_sid_from_sid(request.sid, request.namespace), pkt)
+    
+    def _send_pong(self) -> None:
+        """Send a pong whose packet is encoded once per second."""
+        timestamp = _iso_now()
+        if self._pong_packet[0] != timestamp:
+            self._pong_packet = (timestamp, _EncodedPacket('/ws/chat', 'pong', {'timestamp': timestamp}))
+        self._send_packet(self._pong_packet[1])
+    
+    def _update_typing(self, data: Dict[str, Any], is_typing: bool) -> None:
+        """Apply a typing indicator change for the current socket."""
+        room_id = _room_id(data)
+        if not room_id:
+            self._emit_error('MISSING_ROOM_ID')
+            return
+        
+        # Typing indicators are disposable; drop them while this socket is backed up
+        if self.ws_manager.backpressure(request.sid, request.namespace) > self.BACKPRESSURE_LIMIT:
+            return
+        
+        # Repeated start/stop events for the same room change nothing; skip the broadcast
+        state = (room_id, is_typing)
+        if self._typing_state.get(request.sid) == state:
+            return
+        
+        success = self.ws_manager.handle_typing(request.sid, room_id, is_typing)
+        if success:
+            self._typing_state[request.sid] = state
+        else:
+            self._emit_error('TYPING_FAILED')
+    
     def _register_events(self):
         """Register WebSocket event handlers."""
         
+        @self.socketio.on_error('/ws/chat')
+        def handle_error(e):
+            """Report errors that escape a chat event handler."""
+            logger.exception("Unhandled chat WebSocket error")
+            self._emit_error('INTERNAL')
+        
         @self.socketio.on('connect', namespace='/ws/chat')
         def handle_connect(auth_data):
             """Handle new WebSocket connection."""
+            sid = request.sid
             try:
-                logger.info(f"Chat WebSocket connection attempt from {request.remote_addr}")
+                headers = request.headers
+                origin = headers.get('Origin', '')
+                user_agent = headers.get('User-Agent', '')
+                remote_addr = request.remote_addr
                 
                 # Validate origin
-                origin = request.headers.get('Origin', '')
-                if not self.ws_auth.validate_origin(origin):
-                    logger.warning(f"Invalid origin for WebSocket connection: {origin}")
-                    emit('error', {'message': 'Invalid origin', 'code': 'INVALID_ORIGIN'})
+                if not self._is_origin_allowed(origin):
+                    logger.warning("Invalid origin for WebSocket connection: %s", origin)
+                    self._emit_error('INVALID_ORIGIN')
                     disconnect()
                     return False
                 
                 # Authenticate user
                 success, user_data, error_msg = self.ws_auth.authenticate_socket(auth_data or {})
                 if not success:
-                    logger.warning(f"WebSocket authentication failed: {error_msg}")
-                    emit('error', {'message': error_msg, 'code': 'AUTH_FAILED'})
+                    logger.warning("WebSocket authentication failed: %s", error_msg)
+                    self._emit('error', {'message': error_msg, 'code': 'AUTH_FAILED'})
                     disconnect()
                     return False
                 
                 # Rate limit check
-                if not self.ws_auth.check_rate_limit(user_data['user_id'], '10/minute'):
-                    logger.warning(f"Rate limit exceeded for user {user_data['user_id']}")
-                    emit('error', {'message': 'Rate limit exceeded', 'code': 'RATE_LIMIT'})
+                user_id = user_data['user_id']
+                if not self.ws_auth.check_rate_limit(user_id, '10/minute', '/ws/chat'):
+                    logger.warning("Rate limit exceeded for user %s", user_id)
+                    self._emit_error('RATE_LIMIT')
                     disconnect()
                     return False
                 
                 # Store user data in session
-                self.user_sessions[request.sid] = user_data
+                self._store_session(sid, user_data)
+                session['user_data'] = user_data
                 
                 # Add connection to manager
                 connection = self.ws_manager.add_connection(
-                    socket_id=request.sid,
-                    user_id=user_data['user_id'],
+                    socket_id=sid,
+                    user_id=user_id,
                     session_id=user_data.get('session_id', ''),
-                    ip_address=request.remote_addr,
-                    user_agent=request.headers.get('User-Agent', '')
+                    ip_address=remote_addr,
+                    user_agent=user_agent
                 )
                 
                 # Log connection
                 self.ws_auth.log_connection(
-                    user_data['user_id'],
-                    request.sid,
+                    user_id,
+                    sid,
                     'connect',
-                    {'origin': origin, 'user_agent': request.headers.get('User-Agent', '')}
+                    {'origin': origin, 'user_agent': user_agent}
                 )
                 
                 # Emit connection success
-                emit('connection_established', {
-                    'user_id': user_data['user_id'],
-                    'socket_id': request.sid,
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'available_rooms': self.ws_manager.get_room_list(user_data['user_id'])
+                self._emit('connection_established', {
+                    'user_id': user_id,
+                    'socket_id': sid,
+                    'timestamp': _iso_now(),
+                    'available_rooms': self._get_available_rooms(user_id)
                 })
                 
-                logger.info(f"Chat WebSocket connected: user={user_data['user_id']}, socket={request.sid}")
+                logger.info("Chat WebSocket connected: user=%s, socket=%s, remote=%s", user_id, sid, remote_addr)
                 return True
                 
-            except Exception as e:
-                logger.error(f"Chat WebSocket connection error: {str(e)}")
-                emit('error', {'message': 'Connection failed', 'code': 'CONNECTION_ERROR'})
+            except Exception:
+                logger.exception("Chat WebSocket connection error")
+                self._drop_session(sid)
+                self.ws_manager.remove_connection(sid)
+                self._emit_error('CONNECTION_ERROR')
                 disconnect()
                 return False
         
         @self.socketio.on('disconnect', namespace='/ws/chat')
         def handle_disconnect(reason=None):
             """Handle WebSocket disconnection."""
+            sid = request.sid
+            user_session = self._drop_session(sid)
             try:
-                user_data = self.user_sessions.get(request.sid)
-                if user_data:
-                    # Remove connection from manager
-                    self.ws_manager.remove_connection(request.sid)
-                    
+                if user_session:
                     # Log disconnection
                     self.ws_auth.log_connection(
-                        user_data['user_id'],
-                        request.sid,
+                        user_session.user_id,
+                        sid,
                         'disconnect'
                     )
                     
-                    logger.info(f"Chat WebSocket disconnected: user={user_data['user_id']}, socket={request.sid}")
+                    logger.info("Chat WebSocket disconnected: user=%s, socket=%s", user_session.user_id, sid)
                 
-            except Exception as e:
-                logger.error(f"Chat WebSocket disconnect error: {str(e)}")
+            except Exception:
+                logger.exception("Chat WebSocket disconnect error")
+            finally:
+                # Always release the manager's connection state, even if logging failed
+                self.ws_manager.remove_connection(sid)
         
         @self.socketio.on('join_room', namespace='/ws/chat')
         @require_ws_auth
+        @self._cork()
         def handle_join_room(data, user_data=None):
             """Handle joining a chat room."""
             try:
-                room_id = data.get('room_id')
+                room_id = _room_id(data)
                 if not room_id:
-                    emit('error', {'message': 'Room ID required', 'code': 'MISSING_ROOM_ID'})
+                    self._emit_error('MISSING_ROOM_ID')
                     return
                 
                 # Check room permission
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'read'):
-                    emit('error', {'message': 'Access denied to room', 'code': 'ACCESS_DENIED'})
+                if not self._check_room_permission(user_data, room_id, 'read'):
+                    self._emit_error('ACCESS_DENIED')
                     return
                 
                 # Create room if it doesn't exist (for chat rooms)
                 room = self.ws_manager.get_room(room_id)
-                if not room and room_id.startswith('chat_'):
+                if not room and room_id[:5] == 'chat_':
                     room = self.ws_manager.create_room(
                         room_id=room_id,
                         name=data.get('room_name', f'Chat {room_id}'),
                         room_type=RoomType.CHAT,
                         created_by=user_data['user_id']
                     )
+                    # Chat rooms are listed for every user
+                    self._room_list_cache.clear()
                 
                 if not room:
-                    emit('error', {'message': 'Room not found', 'code': 'ROOM_NOT_FOUND'})
+                    self._emit_error('ROOM_NOT_FOUND')
                     return
                 
                 # Join room
                 success = self.ws_manager.join_room_ws(request.sid, room_id, user_data)
                 if success:
-                    emit('room_joined', {
+                    snapshot = self.ws_manager.get_room_snapshot(room_id)
+                    self._emit('room_joined', {
                         'room_id': room_id,
-                        'room_info': room.to_dict(),
-                        'message_history': self.ws_manager.get_room_history(room_id),
-                        'active_users': self.ws_manager.get_active_users(room_id)
+                        'room_info': snapshot['room'],
+                        'message_history': snapshot['message_history'],
+                        'active_users': snapshot['active_users']
                     })
-                    logger.info(f"User {user_data['user_id']} joined chat room {room_id}")
+                    logger.info("User %s joined chat room %s", user_data['user_id'], room_id)
                 else:
-                    emit('error', {'message': 'Failed to join room', 'code': 'JOIN_FAILED'})
+                    self._emit_error('JOIN_FAILED')
                 
-            except Exception as e:
-                logger.error(f"Join room error: {str(e)}")
-                emit('error', {'message': 'Failed to join room', 'code': 'JOIN_ERROR'})
+            except Exception:
+                logger.exception("Join room error")
+                self._emit_error('JOIN_ERROR')
         
         @self.socketio.on('leave_room', namespace='/ws/chat')
         @require_ws_auth
         def handle_leave_room(data, user_data=None):
             """Handle leaving a chat room."""
             try:
-                room_id = data.get('room_id')
+                room_id = _room_id(data)
                 if not room_id:
-                    emit('error', {'message': 'Room ID required', 'code': 'MISSING_ROOM_ID'})
+                    self._emit_error('MISSING_ROOM_ID')
                     return
                 
                 success = self.ws_manager.leave_room_ws(request.sid, room_id)
                 if success:
-                    emit('room_left', {'room_id': room_id})
-                    logger.info(f"User {user_data['user_id']} left chat room {room_id}")
+                    # Leaving clears the room's typing indicator for this user
+                    if self._typing_state.get(request.sid, (None,))[0] == room_id:
+                        self._typing_state.pop(request.sid, None)
+                    self._emit('room_left', {'room_id': room_id})
+                    logger.info("User %s left chat room %s", user_data['user_id'], room_id)
                 else:
-                    emit('error', {'message': 'Failed to leave room', 'code': 'LEAVE_FAILED'})
+                    self._emit_error('LEAVE_FAILED')
                 
-            except Exception as e:
-                logger.error(f"Leave room error: {str(e)}")
-                emit('error', {'message': 'Failed to leave room', 'code': 'LEAVE_ERROR'})
+            except Exception:
+                logger.exception("Leave room error")
+                self._emit_error('LEAVE_ERROR')
         
         @self.socketio.on('send_message', namespace='/ws/chat')
         @require_ws_auth
-        @rate_limit_ws('message', limit=100, window=60)
+        @rate_limit_ws('message', limit=100, window=60, strategy='sliding_window')
         def handle_send_message(data, user_data=None):
             """Handle sending a chat message."""
             try:
-                room_id = data.get('room_id')
-                content = data.get('content', '').strip()
+                room_id = _room_id(data)
+                content = _extract_message(data)
                 message_type = data.get('message_type', 'text')
                 
                 if not room_id or not content:
-                    emit('error', {'message': 'Room ID and content required', 'code': 'MISSING_DATA'})
+                    self._emit_error('MISSING_MESSAGE_DATA')
                     return
                 
                 # Validate message type
-                try:
-                    msg_type = MessageType(message_type)
-                except ValueError:
-                    emit('error', {'message': 'Invalid message type', 'code': 'INVALID_TYPE'})
+                msg_type = _MSG_TYPES.get(message_type)
+                if msg_type is None:
+                    self._emit_error('INVALID_TYPE')
                     return
                 
                 # Validate content length
                 if len(content) > 2000:
-                    emit('error', {'message': 'Message too long (max 2000 characters)', 'code': 'MESSAGE_TOO_LONG'})
+                    self._emit_error('MESSAGE_TOO_LONG')
                     return
                 
                 # Check room access
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'write'):
-                    emit('error', {'message': 'No write permission for room', 'code': 'NO_WRITE_PERMISSION'})
+                if not self._check_room_permission(user_data, room_id, 'write'):
+                    self._emit_error('NO_WRITE_PERMISSION')
+                    return
+                
+                # Ask the client to retry rather than queue more for a socket that is behind
+                if self.ws_manager.backpressure(request.sid, request.namespace) > self.BACKPRESSURE_LIMIT:
+                    self._emit_error('BACKPRESSURE')
                     return
                 
                 # Send message
@@ -234,17 +589,17 @@ class ChatSocketHandler:
                 )
                 
                 if message:
-                    emit('message_sent', {
+                    self._emit('message_sent', {
                         'message_id': message.id,
-                        'timestamp': message.timestamp.isoformat()
+                        'timestamp': message.timestamp
                     })
-                    logger.info(f"Message sent: {message.id} in room {room_id}")
+                    logger.info("Message sent: %s in room %s", message.id, room_id)
                 else:
-                    emit('error', {'message': 'Failed to send message', 'code': 'SEND_FAILED'})
+                    self._emit_error('SEND_FAILED')
                 
-            except Exception as e:
-                logger.error(f"Send message error: {str(e)}")
-                emit('error', {'message': 'Failed to send message', 'code': 'SEND_ERROR'})
+            except Exception:
+                logger.exception("Send message error")
+                self._emit_error('SEND_ERROR')
         
         @self.socketio.on('send_intelligent_message', namespace='/ws/chat')
         @require_ws_auth
@@ -252,26 +607,26 @@ class ChatSocketHandler:
         def handle_send_intelligent_message(data, user_data=None):
             """Handle sending an intelligent chat message with AI response."""
             try:
-                message = data.get('message') or data.get('content', '').strip()
+                message = _extract_message(data)
                 session_id = data.get('session_id')
                 context = data.get('context', {})
                 
                 if not message or not session_id:
-                    emit('error', {'message': 'Message content and session ID required', 'code': 'MISSING_DATA'})
+                    self._emit_error('MISSING_SESSION_DATA')
                     return
                 
                 # Emit acknowledgment that message was received
-                emit('message_received', {
+                self._emit('message_received', {
                     'message_id': str(uuid.uuid4()),
                     'session_id': session_id,
-                    'timestamp': datetime.utcnow().isoformat(),
+                    'timestamp': datetime.utcnow(),
                     'status': 'processing'
                 })
                 
                 # Emit AI typing indicator
-                emit('ai_typing_start', {
+                self._emit('ai_typing_start', {
                     'session_id': session_id,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': datetime.utcnow()
                 })
                 
                 try:
@@ -284,42 +639,42 @@ class ChatSocketHandler:
                     )
                     
                     # Stop AI typing indicator
-                    emit('ai_typing_stop', {
+                    self._emit('ai_typing_stop', {
                         'session_id': session_id,
-                        'timestamp': datetime.utcnow().isoformat()
+                        'timestamp': datetime.utcnow()
                     })
                     
                     # Send AI response
-                    emit('intelligent_response', {
+                    self._emit('intelligent_response', {
                         'message_id': response.message_id,
                         'session_id': session_id,
                         'content': response.content,
-                        'suggestions': [s.to_dict() for s in response.suggestions],
+                        'suggestions': list(map(_TO_DICT, response.suggestions)),
                         'related_topics': response.related_topics,
                         'study_recommendations': response.study_recommendations,
-                        'timestamp': response.timestamp.isoformat(),
+                        'timestamp': response.timestamp,
                         'analytics': response.analytics
                     })
                     
-                    logger.info(f"Intelligent response sent for session {session_id}")
+                    logger.info("Intelligent response sent for session %s", session_id)
                     
-                except Exception as ai_error:
+                except Exception:
                     # Stop typing indicator on error
-                    emit('ai_typing_stop', {
+                    self._emit('ai_typing_stop', {
                         'session_id': session_id,
-                        'timestamp': datetime.utcnow().isoformat()
+                        'timestamp': datetime.utcnow()
                     })
                     
-                    logger.error(f"AI generation error: {str(ai_error)}")
-                    emit('error', {
+                    logger.exception("AI generation error")
+                    self._emit('error', {
                         'message': 'Failed to generate AI response',
                         'code': 'AI_GENERATION_FAILED',
                         'session_id': session_id
                     })
                 
-            except Exception as e:
-                logger.error(f"Intelligent message error: {str(e)}")
-                emit('error', {'message': 'Failed to process intelligent message', 'code': 'INTELLIGENT_MESSAGE_ERROR'})
+            except Exception:
+                logger.exception("Intelligent message error")
+                self._emit_error('INTELLIGENT_MESSAGE_ERROR')
         
         @self.socketio.on('create_intelligent_session', namespace='/ws/chat')
         @require_ws_auth
@@ -330,13 +685,13 @@ class ChatSocketHandler:
                 # Check if user_data is available
                 if not user_data:
                     logger.error("User data not available for session creation")
-                    emit('error', {'message': 'Authentication required', 'code': 'AUTH_REQUIRED'})
+                    self._emit_error('AUTH_REQUIRED')
                     return
                 
                 # Check required user data fields
                 if not isinstance(user_data, dict) or 'user_id' not in user_data:
-                    logger.error(f"Invalid user data structure: {user_data}")
-                    emit('error', {'message': 'Invalid user authentication', 'code': 'INVALID_AUTH'})
+                    logger.error("Invalid user data structure: %s", user_data)
+                    self._emit_error('INVALID_AUTH')
                     return
                 
                 # Get session parameters
@@ -357,23 +712,23 @@ class ChatSocketHandler:
                 )
                 
                 if not session:
-                    emit('error', {'message': 'Failed to create session', 'code': 'SESSION_CREATE_FAILED'})
+                    self._emit_error('SESSION_CREATE_FAILED')
                     return
                 
-                emit('session_created', {
+                self._emit('session_created', {
                     'session_id': session.id,  # Use 'id' field from ChatSession
                     'title': session.title,
                     'session_type': session.session_type.value if hasattr(session.session_type, 'value') else str(session.session_type),
                     'created_at': session.created_at.isoformat() if hasattr(session, 'created_at') else None,
                     'message_count': session.message_count,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': datetime.utcnow()
                 })
                 
-                logger.info(f"Intelligent session created: {session.id} for user {user_data['user_id']}")
+                logger.info("Intelligent session created: %s for user %s", session.id, user_data['user_id'])
                 
-            except Exception as e:
-                logger.error(f"Create session error: {str(e)}")
-                emit('error', {'message': 'Failed to create session', 'code': 'SESSION_CREATE_ERROR'})
+            except Exception:
+                logger.exception("Create session error")
+                self._emit_error('SESSION_CREATE_ERROR')
         
         @self.socketio.on('get_session_history', namespace='/ws/chat')
         @require_ws_auth
@@ -385,7 +740,7 @@ class ChatSocketHandler:
                 limit = data.get('limit', 50)
                 
                 if not session_id:
-                    emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
+                    self._emit_error('MISSING_SESSION_ID')
                     return
                 
                 # Get messages
@@ -394,16 +749,16 @@ class ChatSocketHandler:
                     limit=limit
                 )
                 
-                emit('session_history', {
+                self._emit('session_history', {
                     'session_id': session_id,
-                    'messages': [msg.to_dict() for msg in messages],
+                    'messages': list(map(_TO_DICT, messages)),
                     'total': total,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': datetime.utcnow()
                 })
                 
-            except Exception as e:
-                logger.error(f"Get session history error: {str(e)}")
-                emit('error', {'message': 'Failed to get session history', 'code': 'HISTORY_ERROR'})
+            except Exception:
+                logger.exception("Get session history error")
+                self._emit_error('HISTORY_ERROR')
         
         @self.socketio.on('get_personalized_suggestions', namespace='/ws/chat')
         @require_ws_auth
@@ -415,7 +770,7 @@ class ChatSocketHandler:
                 current_message = data.get('current_message')
                 
                 if not session_id:
-                    emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
+                    self._emit_error('MISSING_SESSION_ID')
                     return
                 
                 # Get suggestions
@@ -433,63 +788,48 @@ class ChatSocketHandler:
                         grouped_suggestions[suggestion_type] = []
                     grouped_suggestions[suggestion_type].append(suggestion.to_dict())
                 
-                emit('personalized_suggestions', {
+                self._emit('personalized_suggestions', {
                     'session_id': session_id,
                     'suggestions': grouped_suggestions,
                     'total': len(suggestions),
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': datetime.utcnow()
                 })
                 
-            except Exception as e:
-                logger.error(f"Get suggestions error: {str(e)}")
-                emit('error', {'message': 'Failed to get suggestions', 'code': 'SUGGESTIONS_ERROR'})
+            except Exception:
+                logger.exception("Get suggestions error")
+                self._emit_error('SUGGESTIONS_ERROR')
+        
+        @self.socketio.on('typing', namespace='/ws/chat')
+        @require_ws_auth
+        @rate_limit_ws('typing', limit=20, window=60, strategy='sliding_window')
+        def handle_typing(data, user_data=None):
+            """Handle typing indicator; data['active'] selects start or stop."""
+            self._update_typing(data, bool(data.get('active')))
         
         @self.socketio.on('typing_start', namespace='/ws/chat')
         @require_ws_auth
-        @rate_limit_ws('typing', limit=20, window=60)
+        @rate_limit_ws('typing', limit=20, window=60, strategy='sliding_window')
         def handle_typing_start(data, user_data=None):
-            """Handle typing start indicator."""
-            try:
-                room_id = data.get('room_id')
-                if not room_id:
-                    emit('error', {'message': 'Room ID required', 'code': 'MISSING_ROOM_ID'})
-                    return
-                
-                success = self.ws_manager.handle_typing(request.sid, room_id, True)
-                if not success:
-                    emit('error', {'message': 'Failed to update typing status', 'code': 'TYPING_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Typing start error: {str(e)}")
+            """Handle typing start indicator (alias of 'typing' with active=True)."""
+            self._update_typing(data, True)
         
         @self.socketio.on('typing_stop', namespace='/ws/chat')
         @require_ws_auth
-        @rate_limit_ws('typing', limit=20, window=60)
+        @rate_limit_ws('typing', limit=20, window=60, strategy='sliding_window')
         def handle_typing_stop(data, user_data=None):
-            """Handle typing stop indicator."""
-            try:
-                room_id = data.get('room_id')
-                if not room_id:
-                    emit('error', {'message': 'Room ID required', 'code': 'MISSING_ROOM_ID'})
-                    return
-                
-                success = self.ws_manager.handle_typing(request.sid, room_id, False)
-                if not success:
-                    emit('error', {'message': 'Failed to update typing status', 'code': 'TYPING_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Typing stop error: {str(e)}")
+            """Handle typing stop indicator (alias of 'typing' with active=False)."""
+            self._update_typing(data, False)
         
         @self.socketio.on('voice_processing', namespace='/ws/chat')
         @require_ws_auth
         def handle_voice_processing(data, user_data=None):
             """Handle voice message processing status."""
             try:
-                room_id = data.get('room_id')
+                room_id = _room_id(data)
                 status = data.get('status')  # 'processing', 'completed', 'error'
                 
                 if not room_id or not status:
-                    emit('error', {'message': 'Room ID and status required', 'code': 'MISSING_DATA'})
+                    self._emit_error('MISSING_VOICE_DATA')
                     return
                 
                 success = self.ws_manager.handle_voice_processing(
@@ -500,52 +840,49 @@ class ChatSocketHandler:
                 )
                 
                 if not success:
-                    emit('error', {'message': 'Failed to update voice status', 'code': 'VOICE_STATUS_FAILED'})
+                    self._emit_error('VOICE_STATUS_FAILED')
                 
-            except Exception as e:
-                logger.error(f"Voice processing error: {str(e)}")
+            except Exception:
+                logger.exception("Voice processing error")
         
         @self.socketio.on('get_room_info', namespace='/ws/chat')
         @require_ws_auth
+        @self._cork()
         def handle_get_room_info(data, user_data=None):
             """Get information about a room."""
             try:
-                room_id = data.get('room_id')
+                room_id = _room_id(data)
                 if not room_id:
-                    emit('error', {'message': 'Room ID required', 'code': 'MISSING_ROOM_ID'})
+                    self._emit_error('MISSING_ROOM_ID')
                     return
                 
                 # Check room access
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'read'):
-                    emit('error', {'message': 'Access denied to room', 'code': 'ACCESS_DENIED'})
+                if not self._check_room_permission(user_data, room_id, 'read'):
+                    self._emit_error('ACCESS_DENIED')
                     return
                 
-                room = self.ws_manager.get_room(room_id)
-                if not room:
-                    emit('error', {'message': 'Room not found', 'code': 'ROOM_NOT_FOUND'})
+                snapshot = self.ws_manager.get_room_snapshot(room_id, 20)
+                if not snapshot:
+                    self._emit_error('ROOM_NOT_FOUND')
                     return
                 
-                emit('room_info', {
-                    'room': room.to_dict(),
-                    'active_users': self.ws_manager.get_active_users(room_id),
-                    'message_history': self.ws_manager.get_room_history(room_id, 20)
-                })
+                self._emit('room_info', snapshot)
                 
-            except Exception as e:
-                logger.error(f"Get room info error: {str(e)}")
-                emit('error', {'message': 'Failed to get room info', 'code': 'ROOM_INFO_ERROR'})
+            except Exception:
+                logger.exception("Get room info error")
+                self._emit_error('ROOM_INFO_ERROR')
         
         @self.socketio.on('ping', namespace='/ws/chat')
-        @require_ws_auth
-        def handle_ping(data, user_data=None):
-            """Handle ping for connection keep-alive."""
-            try:
-                # Update last activity
-                self.ws_manager.update_last_activity(request.sid)
-                emit('pong', {'timestamp': datetime.utcnow().isoformat()})
-                
-            except Exception as e:
-                logger.error(f"Ping error: {str(e)}")
+        def handle_ping(data=None):
+            """
+            Handle application-level ping from clients that want a server timestamp.
+            
+            Transport keep-alive is handled by Engine.IO's own ping/pong frames
+            (ping_interval/ping_timeout), so this only refreshes activity and replies.
+            The socket was authenticated on connect and no user data is needed here.
+            """
+            self.ws_manager.update_last_activity(request.sid)
+            self._send_pong()
     
     def get_handler_info(self) -> Dict[str, Any]:
         """Get information about registered handlers."""
@@ -553,7 +890,7 @@ class ChatSocketHandler:
             'namespace': '/ws/chat',
             'events': [
                 'connect', 'disconnect', 'join_room', 'leave_room',
-                'send_message', 'typing_start', 'typing_stop',
+                'send_message', 'typing', 'typing_start', 'typing_stop',
                 'voice_processing', 'get_room_info', 'ping'
             ],
             'description': 'Real-time chat functionality with typing indicators and voice processing'
@@ -4,50 +4,84 @@ Real-time collaborative planning and resource management.
 """
 
 import logging
+import queue
+import threading
+import time
 import uuid
-import json
-from typing import Dict, Any, Optional, List
+from functools import lru_cache, wraps
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
-from flask import request
-from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
+from flask import request, session
+from flask_socketio import SocketIO, emit, disconnect
 
-from app.models.websocket_models import EventType, RoomType
+from app.models.websocket_models import (
+    EventType, RoomType, CursorPosition, WebSocketEvent, UserSession, LockEntry, CURSOR_TUPLE_FIELDS,
+    PlanUpdateAck, ActivityDragAck, ResourceLockAck, ResourceUnlockAck
+)
 from app.services.websocket_manager import WebSocketManager
-from app.utils.simple_websocket_auth import SimpleWebSocketAuth, require_ws_auth, require_room_permission, rate_limit_ws
+from app.utils.simple_websocket_auth import SimpleWebSocketAuth, require_ws_auth, rate_limit_ws
 
 logger = logging.getLogger(__name__)
 
-import logging
-import uuid
-from typing import Dict, Any, Optional
-from datetime import datetime
-
-from flask import request
-from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
-
-from app.models.websocket_models import EventType, RoomType
-from app.services.websocket_manager import WebSocketManager
-from app.utils.websocket_auth import WebSocketAuth, require_ws_auth, require_room_permission, rate_limit_ws
+# Plan update operations accepted from clients
+_VALID_PLAN_OPS = frozenset({'create', 'update', 'delete', 'move', 'reorder'})
 
-import logging
-import uuid
-import json
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+@lru_cache(maxsize=4096)
+def _planning_room_id(session_id: str) -> str:
+    """Get the room ID for a planning session, reusing the string for active sessions."""
+    return f"planning_{session_id}"
 
-from flask import request
-from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
+# Current UTC time as an ISO string, reformatted once per 100 ms tick: [tick, iso_string]
+_iso_cache: List[Any] = [0, '']
 
-from app.models.websocket_models import EventType, RoomType
-from app.services.websocket_manager import WebSocketManager
-from app.utils.websocket_auth import WebSocketAuth, require_ws_auth, require_room_permission, rate_limit_ws
+def _iso_now() -> str:
+    """Get the current UTC time as an ISO string with 100 ms resolution."""
+    tick = int(time.time() * 10)
+    if tick != _iso_cache[0]:
+        _iso_cache[1] = datetime.utcfromtimestamp(tick / 10).isoformat()
+        _iso_cache[0] = tick
+    return _iso_cache[1]
 
-logger = logging.getLogger(__name__)
+def ws_handler(log_message: str, error_message: Optional[str] = None,
+               error_code: Optional[str] = None):
+    """
+    Decorator to log exceptions raised by a WebSocket event handler.
+    
+    Args:
+        log_message: Prefix for the logged error
+        error_message: Message of the 'error' event sent to the client, if any
+        error_code: Code of the 'error' event sent to the client
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            except Exception:
+                logger.exception("%s", log_message)
+                if error_message:
+                    emit('error', {'message': error_message, 'code': error_code})
+        return decorated_function
+    return decorator
 
 class CollaborationSocketHandler:
     """Handles WebSocket events for collaborative planning functionality."""
     
+    # Seconds between batched cursor broadcasts (20 Hz)
+    CURSOR_FLUSH_INTERVAL = 0.05
+    
+    # Background workers applying queued plan updates; each room is always
+    # handled by the same worker so its updates apply in arrival order
+    PLAN_UPDATE_WORKERS = 2
+    # Seconds an idle worker sleeps before checking its queue again; polled with
+    # socketio.sleep so eventlet/gevent hubs are never blocked on the queue
+    PLAN_UPDATE_POLL_INTERVAL = 0.02
+    
+    # Seconds a room permission result is reused for the same user
+    PERMISSION_CACHE_TTL = 15
+    PERMISSION_CACHE_SIZE = 50000
+    
     def __init__(self, socketio: SocketIO, ws_manager: WebSocketManager):
         """Initialize collaboration socket handler."""
         self.socketio = socketio
@@ -55,11 +89,118 @@ class CollaborationSocketHandler:
         self.ws_auth = SimpleWebSocketAuth()
         
         # Session storage for socket connections
-        self.user_sessions = {}
+        self.user_sessions: Dict[str, UserSession] = {}
+        
+        # Room permission results: (user_id, room_id, permission) -> (allowed, checked_at)
+        self._permission_cache: Dict[Tuple[str, str, str], Tuple[bool, float]] = {}
+        
+        # Cursor moves awaiting the next broadcast: room_id -> {user_id: position}
+        self._pending_cursors: Dict[str, Dict[str, CursorPosition]] = {}
+        self._cursor_lock = threading.Lock()
+        self.socketio.start_background_task(self._flush_cursor_loop)
+        
+        # Plan updates are applied and broadcast off the event thread, one queue
+        # per worker: (sid, room_id, session_id, operation, target_type, target_id, changes)
+        self._update_queues: List[queue.SimpleQueue] = [
+            queue.SimpleQueue() for _ in range(self.PLAN_UPDATE_WORKERS)
+        ]
+        for update_queue in self._update_queues:
+            self.socketio.start_background_task(self._plan_update_worker, update_queue)
         
         # Register event handlers
         self._register_events()
     
+    def _flush_cursor_loop(self):
+        """Periodically broadcast coalesced cursor moves, one event per room."""
+        while True:
+            self.socketio.sleep(self.CURSOR_FLUSH_INTERVAL)
+            try:
+                self._flush_cursors()
+            except Exception:
+                logger.exception("Cursor flush error")
+    
+    def _flush_cursors(self) -> None:
+        """Broadcast the latest pending cursor position of each user, grouped by room."""
+        with self._cursor_lock:
+            if not self._pending_cursors:
+                return
+            pending, self._pending_cursors = self._pending_cursors, {}
+        
+        for room_id, cursors in pending.items():
+            event = WebSocketEvent(
+                event_type=EventType.CURSOR_MOVED,
+                room_id=room_id,
+                user_id='system',
+                data={
+                    'fields': CURSOR_TUPLE_FIELDS,
+                    'cursors': [cursor.to_tuple() for cursor in cursors.values()]
+                },
+                event_id=str(uuid.uuid4())
+            )
+            self.socketio.emit(EventType.CURSOR_MOVED.value, event.to_dict(),
+                               to=room_id, namespace='/ws/collaboration')
+    
+    def _plan_update_worker(self, update_queue: queue.SimpleQueue):
+        """Apply queued plan updates and report the outcome to the submitting socket."""
+        while True:
+            try:
+                update = update_queue.get_nowait()
+            except queue.Empty:
+                self.socketio.sleep(self.PLAN_UPDATE_POLL_INTERVAL)
+                continue
+            
+            sid, room_id, session_id, operation, target_type, target_id, changes = update
+            try:
+                success = self.ws_manager.handle_plan_update(
+                    socket_id=sid,
+                    room_id=room_id,
+                    operation=operation,
+                    target_type=target_type,
+                    target_id=target_id,
+                    changes=changes,
+                    namespace='/ws/collaboration'
+                )
+                
+                if success:
+                    self.socketio.emit('plan_update_processed', PlanUpdateAck(
+                        session_id, operation, target_type, target_id, _iso_now()
+                    ), to=sid, namespace='/ws/collaboration')
+                    logger.debug("Plan update processed: %s on %s %s", operation, target_type, target_id)
+                else:
+                    self.socketio.emit('error', {'message': 'Failed to process plan update', 'code': 'UPDATE_FAILED'},
+                                       to=sid, namespace='/ws/collaboration')
+                
+            except Exception:
+                logger.exception("Plan update error")
+                self.socketio.emit('error', {'message': 'Failed to update plan', 'code': 'UPDATE_ERROR'},
+                                   to=sid, namespace='/ws/collaboration')
+    
+    def _check_room_permission(self, user_data: Dict[str, Any], room_id: str, permission: str) -> bool:
+        """Check room permission, reusing the user's recent result for the same room."""
+        now = time.monotonic()
+        key = (user_data['user_id'], room_id, permission)
+        cached = self._permission_cache.get(key)
+        if cached and now - cached[1] < self.PERMISSION_CACHE_TTL:
+            return cached[0]
+        
+        allowed = self.ws_auth.check_room_permission(user_data, room_id, permission)
+        if key not in self._permission_cache and len(self._permission_cache) >= self.PERMISSION_CACHE_SIZE:
+            self._permission_cache.pop(next(iter(self._permission_cache)))
+        self._permission_cache[key] = (allowed, now)
+        return allowed
+    
+    def _invalidate_permissions(self, user_id: str, room_id: str) -> None:
+        """Forget cached permission results after the user's membership of a room changes."""
+        for permission in ('read', 'write', 'admin'):
+            self._permission_cache.pop((user_id, room_id, permission), None)
+    
+    def _get_joined_room(self, room_id: str):
+        """Get a room the current socket has joined, without a lookup for rooms it has not."""
+        user_session = self.user_sessions.get(request.sid)
+        if not user_session or room_id not in user_session.joined_rooms:
+            return None
+        return self.ws_manager.get_room(room_id)
+    
     def _register_events(self):
         """Register WebSocket event handlers."""
         
@@ -67,12 +208,12 @@ class CollaborationSocketHandler:
         def handle_connect(auth_data):
             """Handle new WebSocket connection for collaboration."""
             try:
-                logger.info(f"Collaboration WebSocket connection attempt from {request.remote_addr}")
+                logger.info("Collaboration WebSocket connection attempt from %s", request.remote_addr)
                 
                 # Validate origin
                 origin = request.headers.get('Origin', '')
                 if not self.ws_auth.validate_origin(origin):
-                    logger.warning(f"Invalid origin for collaboration WebSocket: {origin}")
+                    logger.warning("Invalid origin for collaboration WebSocket: %s", origin)
                     emit('error', {'message': 'Invalid origin', 'code': 'INVALID_ORIGIN'})
                     disconnect()
                     return False
@@ -80,20 +221,21 @@ class CollaborationSocketHandler:
                 # Authenticate user
                 success, user_data, error_msg = self.ws_auth.authenticate_socket(auth_data or {})
                 if not success:
-                    logger.warning(f"Collaboration WebSocket auth failed: {error_msg}")
+                    logger.warning("Collaboration WebSocket auth failed: %s", error_msg)
                     emit('error', {'message': error_msg, 'code': 'AUTH_FAILED'})
                     disconnect()
                     return False
                 
                 # Rate limit check
-                if not self.ws_auth.check_rate_limit(user_data['user_id'], '10/minute'):
-                    logger.warning(f"Rate limit exceeded for collaboration user {user_data['user_id']}")
+                if not self.ws_auth.check_rate_limit(user_data['user_id'], '10/minute', '/ws/collaboration'):
+                    logger.warning("Rate limit exceeded for collaboration user %s", user_data['user_id'])
                     emit('error', {'message': 'Rate limit exceeded', 'code': 'RATE_LIMIT'})
                     disconnect()
                     return False
                 
                 # Store user data in session
-                self.user_sessions[request.sid] = user_data
+                session['user_data'] = user_data
+                self.user_sessions[request.sid] = UserSession.from_user_data(user_data)
                 
                 # Add connection to manager
                 connection = self.ws_manager.add_connection(
@@ -116,11 +258,11 @@ class CollaborationSocketHandler:
                 emit('collaboration_connected', {
                     'user_id': user_data['user_id'],
                     'socket_id': request.sid,
-                    'timestamp': datetime.utcnow().isoformat(),
+                    'timestamp': _iso_now(),
                     'available_rooms': self.ws_manager.get_room_list(user_data['user_id'])
                 })
                 
-                logger.info(f"Collaboration WebSocket connected: user={user_data['user_id']}, socket={request.sid}")
+                logger.info("Collaboration WebSocket connected: user=%s, socket=%s", user_data['user_id'], request.sid)
                 return True
                 
             except Exception as e:
@@ -130,407 +272,372 @@ class CollaborationSocketHandler:
                 return False
         
         @self.socketio.on('disconnect', namespace='/ws/collaboration')
+        @ws_handler('Collaboration WebSocket disconnect error')
         def handle_disconnect(reason=None):
             """Handle WebSocket disconnection."""
-            try:
-                user_data = self.user_sessions.get(request.sid)
-                if user_data:
-                    # Remove connection from manager
-                    self.ws_manager.remove_connection(request.sid)
-                    
-                    # Log disconnection
-                    self.ws_auth.log_connection(
-                        user_data['user_id'],
-                        request.sid,
-                        'collaboration_disconnect'
-                    )
-                    
-                    logger.info(f"Collaboration WebSocket disconnected: user={user_data['user_id']}, socket={request.sid}")
+            user_session = self.user_sessions.pop(request.sid, None)
+            if user_session:
+                # Remove connection from manager
+                self.ws_manager.remove_connection(request.sid)
                 
-            except Exception as e:
-                logger.error(f"Collaboration WebSocket disconnect error: {str(e)}")
+                # Log disconnection
+                self.ws_auth.log_connection(
+                    user_session.user_id,
+                    request.sid,
+                    'collaboration_disconnect'
+                )
+                
+                logger.info("Collaboration WebSocket disconnected: user=%s, socket=%s", user_session.user_id, request.sid)
         
         @self.socketio.on('join_planning_session', namespace='/ws/collaboration')
+        @ws_handler('Join planning session error', 'Failed to join planning session', 'JOIN_ERROR')
         @require_ws_auth
         def handle_join_planning_session(data, user_data=None):
             """Handle joining a collaborative planning session."""
-            try:
-                session_id = data.get('session_id')
-                plan_id = data.get('plan_id')
-                
-                if not session_id:
-                    emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
-                    return
-                
-                # Create room ID for planning session
-                room_id = f"planning_{session_id}"
-                
-                # Check permission to access the plan
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'read'):
-                    emit('error', {'message': 'Access denied to planning session', 'code': 'ACCESS_DENIED'})
-                    return
-                
-                # Create room if it doesn't exist
-                room = self.ws_manager.get_room(room_id)
-                if not room:
-                    room = self.ws_manager.create_room(
-                        room_id=room_id,
-                        name=data.get('session_name', f'Planning Session {session_id}'),
-                        room_type=RoomType.PLANNING,
-                        created_by=user_data['user_id'],
-                        settings={
-                            'plan_id': plan_id,
-                            'session_id': session_id,
-                            'auto_save': data.get('auto_save', True),
-                            'conflict_resolution': data.get('conflict_resolution', 'merge')
-                        }
-                    )
-                
-                # Join room
-                success = self.ws_manager.join_room_ws(request.sid, room_id, user_data)
-                if success:
-                    emit('planning_session_joined', {
-                        'session_id': session_id,
-                        'room_id': room_id,
+            session_id = data.get('session_id')
+            plan_id = data.get('plan_id')
+            
+            if not session_id:
+                emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
+                return
+            
+            # Create room ID for planning session
+            room_id = _planning_room_id(session_id)
+            
+            # Check permission to access the plan
+            if not self._check_room_permission(user_data, room_id, 'read'):
+                emit('error', {'message': 'Access denied to planning session', 'code': 'ACCESS_DENIED'})
+                return
+            
+            # Create room if it doesn't exist
+            room = self.ws_manager.get_room(room_id)
+            if not room:
+                room = self.ws_manager.create_room(
+                    room_id=room_id,
+                    name=data.get('session_name', f'Planning Session {session_id}'),
+                    room_type=RoomType.PLANNING,
+                    created_by=user_data['user_id'],
+                    settings={
                         'plan_id': plan_id,
-                        'room_info': room.to_dict(),
-                        'active_users': self.ws_manager.get_active_users(room_id),
-                        'settings': room.settings
-                    })
-                    logger.info(f"User {user_data['user_id']} joined planning session {session_id}")
-                else:
-                    emit('error', {'message': 'Failed to join planning session', 'code': 'JOIN_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Join planning session error: {str(e)}")
-                emit('error', {'message': 'Failed to join planning session', 'code': 'JOIN_ERROR'})
+                        'session_id': session_id,
+                        'auto_save': data.get('auto_save', True),
+                        'conflict_resolution': data.get('conflict_resolution', 'merge')
+                    }
+                )
+            
+            # Join room
+            success = self.ws_manager.join_room_ws(request.sid, room_id, user_data)
+            if success:
+                self._invalidate_permissions(user_data['user_id'], room_id)
+                user_session = self.user_sessions.get(request.sid)
+                if user_session:
+                    user_session.joined_rooms.add(room_id)
+                emit('planning_session_joined', {
+                    'session_id': session_id,
+                    'room_id': room_id,
+                    'plan_id': plan_id,
+                    'room_info': room.cached_dict(),
+                    'active_users': self.ws_manager.get_active_users(room_id),
+                    'settings': room.settings
+                })
+                logger.info("User %s joined planning session %s", user_data['user_id'], session_id)
+            else:
+                emit('error', {'message': 'Failed to join planning session', 'code': 'JOIN_FAILED'})
         
         @self.socketio.on('leave_planning_session', namespace='/ws/collaboration')
+        @ws_handler('Leave planning session error', 'Failed to leave planning session', 'LEAVE_ERROR')
         @require_ws_auth
         def handle_leave_planning_session(data, user_data=None):
             """Handle leaving a collaborative planning session."""
-            try:
-                session_id = data.get('session_id')
-                if not session_id:
-                    emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                success = self.ws_manager.leave_room_ws(request.sid, room_id)
-                if success:
-                    emit('planning_session_left', {'session_id': session_id, 'room_id': room_id})
-                    logger.info(f"User {user_data['user_id']} left planning session {session_id}")
-                else:
-                    emit('error', {'message': 'Failed to leave planning session', 'code': 'LEAVE_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Leave planning session error: {str(e)}")
-                emit('error', {'message': 'Failed to leave planning session', 'code': 'LEAVE_ERROR'})
+            session_id = data.get('session_id')
+            if not session_id:
+                emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            success = self.ws_manager.leave_room_ws(request.sid, room_id)
+            if success:
+                self._invalidate_permissions(user_data['user_id'], room_id)
+                user_session = self.user_sessions.get(request.sid)
+                if user_session:
+                    user_session.joined_rooms.discard(room_id)
+                emit('planning_session_left', {'session_id': session_id, 'room_id': room_id})
+                logger.info("User %s left planning session %s", user_data['user_id'], session_id)
+            else:
+                emit('error', {'message': 'Failed to leave planning session', 'code': 'LEAVE_FAILED'})
         
         @self.socketio.on('plan_updated', namespace='/ws/collaboration')
+        @ws_handler('Plan update error', 'Failed to update plan', 'UPDATE_ERROR')
         @require_ws_auth
         @rate_limit_ws('plan_update', limit=50, window=60)
         def handle_plan_update(data, user_data=None):
             """Handle real-time plan updates."""
-            try:
-                session_id = data.get('session_id')
-                operation = data.get('operation')  # 'create', 'update', 'delete', 'move'
-                target_type = data.get('target_type')  # 'plan', 'activity', 'lesson'
-                target_id = data.get('target_id')
-                changes = data.get('changes', {})
-                
-                if not all([session_id, operation, target_type, target_id]):
-                    emit('error', {'message': 'Missing required fields for plan update', 'code': 'MISSING_DATA'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                
-                # Check write permission
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'write'):
-                    emit('error', {'message': 'No write permission for planning session', 'code': 'NO_WRITE_PERMISSION'})
-                    return
-                
-                # Validate operation
-                valid_operations = ['create', 'update', 'delete', 'move', 'reorder']
-                if operation not in valid_operations:
-                    emit('error', {'message': 'Invalid operation', 'code': 'INVALID_OPERATION'})
-                    return
-                
-                # Handle the plan update
-                success = self.ws_manager.handle_plan_update(
-                    socket_id=request.sid,
-                    room_id=room_id,
-                    operation=operation,
-                    target_type=target_type,
-                    target_id=target_id,
-                    changes=changes
-                )
-                
-                if success:
-                    emit('plan_update_processed', {
-                        'session_id': session_id,
-                        'operation': operation,
-                        'target_type': target_type,
-                        'target_id': target_id,
-                        'timestamp': datetime.utcnow().isoformat()
-                    })
-                    logger.info(f"Plan update processed: {operation} on {target_type} {target_id}")
-                else:
-                    emit('error', {'message': 'Failed to process plan update', 'code': 'UPDATE_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Plan update error: {str(e)}")
-                emit('error', {'message': 'Failed to update plan', 'code': 'UPDATE_ERROR'})
+            session_id = data.get('session_id')
+            operation = data.get('operation')  # 'create', 'update', 'delete', 'move'
+            target_type = data.get('target_type')  # 'plan', 'activity', 'lesson'
+            target_id = data.get('target_id')
+            changes = data.get('changes', {})
+            
+            if not all([session_id, operation, target_type, target_id]):
+                emit('error', {'message': 'Missing required fields for plan update', 'code': 'MISSING_DATA'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            
+            # Check write permission
+            if not self._check_room_permission(user_data, room_id, 'write'):
+                emit('error', {'message': 'No write permission for planning session', 'code': 'NO_WRITE_PERMISSION'})
+                return
+            
+            # Validate operation
+            if operation not in _VALID_PLAN_OPS:
+                emit('error', {'message': 'Invalid operation', 'code': 'INVALID_OPERATION'})
+                return
+            
+            # Acknowledge receipt before handing the update to a worker, so the
+            # ack always precedes plan_update_processed or an error
+            emit('plan_update_queued', PlanUpdateAck(
+                session_id, operation, target_type, target_id, _iso_now()
+            ))
+            self._update_queues[hash(room_id) % self.PLAN_UPDATE_WORKERS].put(
+                (request.sid, room_id, session_id, operation, target_type, target_id, changes)
+            )
         
         @self.socketio.on('cursor_moved', namespace='/ws/collaboration')
+        @ws_handler('Cursor move error')
         @require_ws_auth
         @rate_limit_ws('cursor_move', limit=100, window=60)
         def handle_cursor_moved(data, user_data=None):
             """Handle real-time cursor position updates."""
-            try:
-                session_id = data.get('session_id')
-                x = data.get('x')
-                y = data.get('y')
-                element_id = data.get('element_id')
-                selection_start = data.get('selection_start')
-                selection_end = data.get('selection_end')
-                
-                if not session_id or x is None or y is None:
-                    emit('error', {'message': 'Session ID and coordinates required', 'code': 'MISSING_DATA'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                
-                # Update cursor position
-                success = self.ws_manager.update_cursor_position(
-                    socket_id=request.sid,
-                    room_id=room_id,
-                    x=float(x),
-                    y=float(y),
-                    element_id=element_id,
-                    selection_start=selection_start,
-                    selection_end=selection_end
-                )
-                
-                if not success:
-                    emit('error', {'message': 'Failed to update cursor position', 'code': 'CURSOR_UPDATE_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Cursor move error: {str(e)}")
+            session_id = data.get('session_id')
+            x = data.get('x')
+            y = data.get('y')
+            element_id = data.get('element_id')
+            selection_start = data.get('selection_start')
+            selection_end = data.get('selection_end')
+            
+            if not session_id or x is None or y is None:
+                emit('error', {'message': 'Session ID and coordinates required', 'code': 'MISSING_DATA'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            
+            # Update cursor position; the broadcast is batched by _flush_cursor_loop
+            cursor_pos = self.ws_manager.update_cursor_position(
+                socket_id=request.sid,
+                room_id=room_id,
+                x=float(x),
+                y=float(y),
+                element_id=element_id,
+                selection_start=selection_start,
+                selection_end=selection_end,
+                broadcast=False
+            )
+            
+            if cursor_pos is None:
+                emit('error', {'message': 'Failed to update cursor position', 'code': 'CURSOR_UPDATE_FAILED'})
+                return
+            
+            # Later moves in the same interval overwrite earlier ones
+            with self._cursor_lock:
+                self._pending_cursors.setdefault(room_id, {})[cursor_pos.user_id] = cursor_pos
         
         @self.socketio.on('activity_dragged', namespace='/ws/collaboration')
+        @ws_handler('Activity drag error', 'Failed to process activity drag', 'DRAG_ERROR')
         @require_ws_auth
         @rate_limit_ws('activity_drag', limit=30, window=60)
         def handle_activity_dragged(data, user_data=None):
             """Handle drag-and-drop operations for activities."""
-            try:
-                session_id = data.get('session_id')
-                activity_id = data.get('activity_id')
-                from_position = data.get('from_position', {})
-                to_position = data.get('to_position', {})
-                
-                if not all([session_id, activity_id, from_position, to_position]):
-                    emit('error', {'message': 'Missing required data for activity drag', 'code': 'MISSING_DATA'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                
-                # Check write permission
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'write'):
-                    emit('error', {'message': 'No write permission for activity drag', 'code': 'NO_WRITE_PERMISSION'})
-                    return
-                
-                # Handle activity drag
-                success = self.ws_manager.handle_activity_drag(
-                    socket_id=request.sid,
-                    room_id=room_id,
-                    activity_id=activity_id,
-                    from_position=from_position,
-                    to_position=to_position
-                )
-                
-                if success:
-                    emit('activity_drag_processed', {
-                        'session_id': session_id,
-                        'activity_id': activity_id,
-                        'from_position': from_position,
-                        'to_position': to_position,
-                        'timestamp': datetime.utcnow().isoformat()
-                    })
-                    logger.info(f"Activity drag processed: {activity_id} in session {session_id}")
-                else:
-                    emit('error', {'message': 'Failed to process activity drag', 'code': 'DRAG_FAILED'})
-                
-            except Exception as e:
-                logger.error(f"Activity drag error: {str(e)}")
-                emit('error', {'message': 'Failed to process activity drag', 'code': 'DRAG_ERROR'})
+            session_id = data.get('session_id')
+            activity_id = data.get('activity_id')
+            from_position = data.get('from_position', {})
+            to_position = data.get('to_position', {})
+            
+            if not all([session_id, activity_id, from_position, to_position]):
+                emit('error', {'message': 'Missing required data for activity drag', 'code': 'MISSING_DATA'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            
+            # Check write permission
+            if not self._check_room_permission(user_data, room_id, 'write'):
+                emit('error', {'message': 'No write permission for activity drag', 'code': 'NO_WRITE_PERMISSION'})
+                return
+            
+            # Handle activity drag
+            success = self.ws_manager.handle_activity_drag(
+                socket_id=request.sid,
+                room_id=room_id,
+                activity_id=activity_id,
+                from_position=from_position,
+                to_position=to_position
+            )
+            
+            if success:
+                emit('activity_drag_processed', ActivityDragAck(
+                    session_id, activity_id, from_position, to_position, _iso_now()
+                ))
+                logger.debug("Activity drag processed: %s in session %s", activity_id, session_id)
+            else:
+                emit('error', {'message': 'Failed to process activity drag', 'code': 'DRAG_FAILED'})
         
         @self.socketio.on('lock_resource', namespace='/ws/collaboration')
+        @ws_handler('Lock resource error', 'Failed to lock resource', 'LOCK_ERROR')
         @require_ws_auth
         def handle_lock_resource(data, user_data=None):
             """Handle locking a resource for exclusive editing."""
-            try:
-                session_id = data.get('session_id')
-                resource_type = data.get('resource_type')  # 'activity', 'lesson', 'plan'
-                resource_id = data.get('resource_id')
-                
-                if not all([session_id, resource_type, resource_id]):
-                    emit('error', {'message': 'Missing required data for resource lock', 'code': 'MISSING_DATA'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                room = self.ws_manager.get_room(room_id)
-                
-                if not room or user_data['user_id'] not in room.active_users:
-                    emit('error', {'message': 'Not in planning session', 'code': 'NOT_IN_SESSION'})
+            session_id = data.get('session_id')
+            resource_type = data.get('resource_type')  # 'activity', 'lesson', 'plan'
+            resource_id = data.get('resource_id')
+            
+            if not all([session_id, resource_type, resource_id]):
+                emit('error', {'message': 'Missing required data for resource lock', 'code': 'MISSING_DATA'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            room = self._get_joined_room(room_id)
+            if not room:
+                emit('error', {'message': 'Not in planning session', 'code': 'NOT_IN_SESSION'})
+                return
+            
+            # Check if resource is already locked
+            locks = room.resource_locks
+            lock_key = f"{resource_type}:{resource_id}"
+            
+            if lock_key in locks:
+                locked_by = locks[lock_key].user_id
+                if locked_by != user_data['user_id']:
+                    emit('resource_lock_failed', {
+                        'resource_type': resource_type,
+                        'resource_id': resource_id,
+                        'locked_by': locked_by,
+                        'message': 'Resource is already locked by another user'
+                    })
                     return
-                
-                # Check if resource is already locked
-                locks = room.settings.get('resource_locks', {})
-                lock_key = f"{resource_type}:{resource_id}"
-                
-                if lock_key in locks:
-                    locked_by = locks[lock_key]['user_id']
-                    if locked_by != user_data['user_id']:
-                        emit('resource_lock_failed', {
-                            'resource_type': resource_type,
-                            'resource_id': resource_id,
-                            'locked_by': locked_by,
-                            'message': 'Resource is already locked by another user'
-                        })
-                        return
-                
-                # Lock the resource
-                locks[lock_key] = {
-                    'user_id': user_data['user_id'],
-                    'user_name': user_data.get('name', 'Unknown'),
-                    'locked_at': datetime.utcnow().isoformat()
-                }
-                room.settings['resource_locks'] = locks
-                
-                # Emit lock event to all users in the room
-                self.ws_manager._emit_to_room(room_id, EventType.PLAN_UPDATED, {
-                    'type': 'resource_locked',
-                    'resource_type': resource_type,
-                    'resource_id': resource_id,
-                    'locked_by': user_data['user_id'],
-                    'locked_by_name': user_data.get('name', 'Unknown')
-                })
-                
-                emit('resource_locked', {
-                    'resource_type': resource_type,
-                    'resource_id': resource_id,
-                    'locked_at': locks[lock_key]['locked_at']
-                })
-                
-                logger.info(f"Resource locked: {lock_key} by {user_data['user_id']}")
-                
-            except Exception as e:
-                logger.error(f"Lock resource error: {str(e)}")
-                emit('error', {'message': 'Failed to lock resource', 'code': 'LOCK_ERROR'})
+            
+            # Lock the resource
+            lock = locks[lock_key] = LockEntry(
+                user_id=user_data['user_id'],
+                user_name=user_data.get('name', 'Unknown')
+            )
+            room.record_change('resource_locked', lock_key, lock.to_dict())
+            
+            # Emit lock event to all users in the room
+            self.ws_manager._emit_to_room(room_id, EventType.PLAN_UPDATED, {
+                'type': 'resource_locked',
+                'resource_type': resource_type,
+                'resource_id': resource_id,
+                'locked_by': user_data['user_id'],
+                'locked_by_name': user_data.get('name', 'Unknown')
+            })
+            
+            emit('resource_locked', ResourceLockAck(resource_type, resource_id, lock.locked_at_iso()))
+            
+            logger.debug("Resource locked: %s by %s", lock_key, user_data['user_id'])
         
         @self.socketio.on('unlock_resource', namespace='/ws/collaboration')
+        @ws_handler('Unlock resource error', 'Failed to unlock resource', 'UNLOCK_ERROR')
         @require_ws_auth
         def handle_unlock_resource(data, user_data=None):
             """Handle unlocking a resource."""
-            try:
-                session_id = data.get('session_id')
-                resource_type = data.get('resource_type')
-                resource_id = data.get('resource_id')
-                
-                if not all([session_id, resource_type, resource_id]):
-                    emit('error', {'message': 'Missing required data for resource unlock', 'code': 'MISSING_DATA'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                room = self.ws_manager.get_room(room_id)
-                
-                if not room or user_data['user_id'] not in room.active_users:
-                    emit('error', {'message': 'Not in planning session', 'code': 'NOT_IN_SESSION'})
-                    return
-                
-                # Check if user owns the lock
-                locks = room.settings.get('resource_locks', {})
-                lock_key = f"{resource_type}:{resource_id}"
-                
-                if lock_key not in locks:
-                    emit('error', {'message': 'Resource is not locked', 'code': 'NOT_LOCKED'})
-                    return
-                
-                locked_by = locks[lock_key]['user_id']
-                if locked_by != user_data['user_id'] and user_data.get('role') != 'admin':
-                    emit('error', {'message': 'Cannot unlock resource locked by another user', 'code': 'UNLOCK_DENIED'})
-                    return
-                
-                # Unlock the resource
-                del locks[lock_key]
-                room.settings['resource_locks'] = locks
-                
-                # Emit unlock event to all users in the room
-                self.ws_manager._emit_to_room(room_id, EventType.PLAN_UPDATED, {
-                    'type': 'resource_unlocked',
-                    'resource_type': resource_type,
-                    'resource_id': resource_id,
-                    'unlocked_by': user_data['user_id']
-                })
-                
-                emit('resource_unlocked', {
-                    'resource_type': resource_type,
-                    'resource_id': resource_id
-                })
-                
-                logger.info(f"Resource unlocked: {lock_key} by {user_data['user_id']}")
-                
-            except Exception as e:
-                logger.error(f"Unlock resource error: {str(e)}")
-                emit('error', {'message': 'Failed to unlock resource', 'code': 'UNLOCK_ERROR'})
+            session_id = data.get('session_id')
+            resource_type = data.get('resource_type')
+            resource_id = data.get('resource_id')
+            
+            if not all([session_id, resource_type, resource_id]):
+                emit('error', {'message': 'Missing required data for resource unlock', 'code': 'MISSING_DATA'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            room = self._get_joined_room(room_id)
+            if not room:
+                emit('error', {'message': 'Not in planning session', 'code': 'NOT_IN_SESSION'})
+                return
+            
+            # Check if user owns the lock
+            locks = room.resource_locks
+            lock_key = f"{resource_type}:{resource_id}"
+            
+            if lock_key not in locks:
+                emit('error', {'message': 'Resource is not locked', 'code': 'NOT_LOCKED'})
+                return
+            
+            locked_by = locks[lock_key].user_id
+            if locked_by != user_data['user_id'] and user_data.get('role') != 'admin':
+                emit('error', {'message': 'Cannot unlock resource locked by another user', 'code': 'UNLOCK_DENIED'})
+                return
+            
+            # Unlock the resource
+            del locks[lock_key]
+            room.record_change('resource_unlocked', lock_key)
+            
+            # Emit unlock event to all users in the room
+            self.ws_manager._emit_to_room(room_id, EventType.PLAN_UPDATED, {
+                'type': 'resource_unlocked',
+                'resource_type': resource_type,
+                'resource_id': resource_id,
+                'unlocked_by': user_data['user_id']
+            })
+            
+            emit('resource_unlocked', ResourceUnlockAck(resource_type, resource_id))
+            
+            logger.debug("Resource unlocked: %s by %s", lock_key, user_data['user_id'])
         
         @self.socketio.on('get_session_state', namespace='/ws/collaboration')
+        @ws_handler('Get session state error', 'Failed to get session state', 'STATE_ERROR')
         @require_ws_auth
         def handle_get_session_state(data, user_data=None):
             """Get current state of planning session."""
-            try:
-                session_id = data.get('session_id')
-                if not session_id:
-                    emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
-                    return
-                
-                room_id = f"planning_{session_id}"
-                room = self.ws_manager.get_room(room_id)
-                
-                if not room:
-                    emit('error', {'message': 'Planning session not found', 'code': 'SESSION_NOT_FOUND'})
-                    return
-                
-                # Check read permission
-                if not self.ws_auth.check_room_permission(user_data, room_id, 'read'):
-                    emit('error', {'message': 'Access denied to planning session', 'code': 'ACCESS_DENIED'})
+            session_id = data.get('session_id')
+            if not session_id:
+                emit('error', {'message': 'Session ID required', 'code': 'MISSING_SESSION_ID'})
+                return
+            
+            room_id = _planning_room_id(session_id)
+            room = self.ws_manager.get_room(room_id)
+            
+            if not room:
+                emit('error', {'message': 'Planning session not found', 'code': 'SESSION_NOT_FOUND'})
+                return
+            
+            # Check read permission
+            if not self._check_room_permission(user_data, room_id, 'read'):
+                emit('error', {'message': 'Access denied to planning session', 'code': 'ACCESS_DENIED'})
+                return
+            
+            # Clients that already hold a recent state only need the changes since then
+            since_version = data.get('since_version')
+            if isinstance(since_version, int):
+                changes = room.changes_since(since_version)
+                if changes is not None:
+                    emit('session_state', {
+                        'session_id': session_id,
+                        'version': room.version,
+                        'since_version': since_version,
+                        'changes': changes
+                    })
                     return
-                
-                emit('session_state', {
-                    'session_id': session_id,
-                    'room_info': room.to_dict(),
-                    'active_users': self.ws_manager.get_active_users(room_id),
-                    'cursor_positions': {uid: pos.to_dict() for uid, pos in room.cursor_positions.items()},
-                    'resource_locks': room.settings.get('resource_locks', {}),
-                    'settings': room.settings
-                })
-                
-            except Exception as e:
-                logger.error(f"Get session state error: {str(e)}")
-                emit('error', {'message': 'Failed to get session state', 'code': 'STATE_ERROR'})
+            
+            emit('session_state', {
+                'session_id': session_id,
+                'version': room.version,
+                'room_info': room.cached_dict(),
+                'active_users': self.ws_manager.get_active_users(room_id),
+                # Cursors are packed as lists ordered by cursor_fields to avoid repeating keys
+                'cursor_fields': CURSOR_TUPLE_FIELDS,
+                'cursor_positions': [cursor.to_tuple() for cursor in room.cursor_positions.values()],
+                'resource_locks': {key: lock.to_dict() for key, lock in room.resource_locks.items()},
+                'settings': room.settings
+            })
         
         @self.socketio.on('ping', namespace='/ws/collaboration')
+        @ws_handler('Collaboration ping error')
         @require_ws_auth
         def handle_ping(data, user_data=None):
             """Handle ping for connection keep-alive."""
-            try:
-                # Update last activity
-                self.ws_manager.update_last_activity(request.sid)
-                emit('pong', {'timestamp': datetime.utcnow().isoformat()})
-                
-            except Exception as e:
-                logger.error(f"Collaboration ping error: {str(e)}")
+            # Update last activity
+            self.ws_manager.update_last_activity(request.sid)
+            emit('pong', {'timestamp': _iso_now()})
     
     def get_handler_info(self) -> Dict[str, Any]:
         """Get information about registered handlers."""
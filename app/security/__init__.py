@@ -64,19 +64,3 @@ __all__ = [
     'raise_validation_error',
     'raise_security_violation'
 ]
-
-from .auth_manager import AuthManager
-from .crypto_manager import CryptoManager
-from .audit_logger import AuditLogger
-from .content_filter import ContentFilter
-from .rate_limiter import RateLimiter
-from .error_handler import SecurityErrorHandler
-
-__all__ = [
-    'AuthManager',
-    'CryptoManager', 
-    'AuditLogger',
-    'ContentFilter',
-    'RateLimiter',
-    'SecurityErrorHandler'
-]
@@ -3,14 +3,120 @@ Comprehensive Audit Logger
 Track all user actions, system events, and security incidents.
 """
 
+import atexit
+import itertools
 import os
-import json
 import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 from enum import Enum
+import orjson
 import redis
-from flask import request, g
+from flask import request, g, has_request_context
+
+# Shared by every AuditLogger so instances do not each open their own connections
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+def _get_redis_pool() -> redis.BlockingConnectionPool:
+    """Get the process-wide audit Redis connection pool, creating it on first use."""
+    global _redis_pool
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                _redis_pool = redis.BlockingConnectionPool(
+                    host=os.getenv('REDIS_HOST', 'localhost'),
+                    port=int(os.getenv('REDIS_PORT', 6379)),
+                    db=int(os.getenv('REDIS_AUDIT_DB', 2)),
+                    max_connections=int(os.getenv('REDIS_AUDIT_MAX_CONNECTIONS', 32)),
+                    timeout=5,  # Seconds to wait for a free connection
+                    decode_responses=True
+                )
+    return _redis_pool
+
+def _dumps(obj: Any) -> bytes:
+    """Encode an audit record; values orjson cannot encode are written as strings."""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+def _epoch(moment: datetime) -> float:
+    """Convert a datetime to epoch seconds, treating naive values as UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") for the most recent second formatted
+_iso_second = (0, '')
+
+def _now_iso() -> str:
+    """
+    Current UTC time in ISO 8601 form with microseconds, as datetime.isoformat gives.
+    
+    The date and time up to the second is formatted once per second and reused,
+    so most calls only format the microseconds.
+    """
+    global _iso_second
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _iso_second
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _iso_second = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1e6):06d}+00:00"
+
+# Increment each counter key, starting its expiry window when the key is created,
+# and return the new counts; atomic and a single round trip for any number of keys
+_INCR_WINDOW_SCRIPT = """
+local counts = {}
+for i, key in ipairs(KEYS) do
+    local count = redis.call('INCR', key)
+    if count == 1 then
+        redis.call('EXPIRE', key, ARGV[1])
+    end
+    counts[i] = count
+end
+return counts
+"""
+
+def _log_line(timestamp: str, level: bytes, payload: bytes) -> bytes:
+    """Wrap an encoded record in the audit log line envelope."""
+    return b'{"timestamp":"' + timestamp.encode() + b'","level":"' + level + b'","message":' + payload + b'}\n'
+
+class _BufferedFileHandler(logging.FileHandler):
+    """Binary audit log file that leaves flushing to its owner."""
+    
+    # Large enough that a second of audit lines usually leaves in one write(2)
+    BUFFER_SIZE = 256 * 1024
+    
+    def __init__(self, filename: str):
+        super().__init__(filename, mode='ab', delay=True)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.BUFFER_SIZE)
+    
+    def write_lines(self, data: bytes, flush: bool = False):
+        """Append prebuilt log lines to the stream buffer."""
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(data)
+            if flush:
+                self.stream.flush()
+        finally:
+            self.release()
+    
+    def emit(self, record: logging.LogRecord):
+        # Records logged through the audit logger by other code; StreamHandler.emit
+        # would flush after every record, so only buffer here
+        try:
+            self.write_lines((self.format(record) + self.terminator).encode(),
+                             flush=record.levelno >= logging.CRITICAL)
+        except Exception:
+            self.handleError(record)
 
 class AuditEventType(Enum):
     # Authentication events
@@ -59,18 +165,98 @@ class AuditSeverity(Enum):
     HIGH = "high"
     CRITICAL = "critical"
 
+@dataclass(slots=True)
+class AuditEntry:
+    """A single audit record; encodes to JSON in field order."""
+    event_id: str
+    timestamp: str
+    event_type: str
+    severity: str
+    user_id: Optional[str]
+    session_id: Optional[str]
+    ip_address: Optional[str]
+    user_agent: Optional[str]
+    endpoint: Optional[str]
+    method: Optional[str]
+    resource: Optional[str]
+    outcome: str
+    details: Dict[str, Any]
+    request_id: Optional[str]
+
+# Redis key prefixes, pre-encoded so redis-py sends the bytes as-is; type and
+# severity index keys come from fixed enums and are built in full up front
+_K_AUDIT = b"audit:"
+_K_USER_AUDIT = b"user_audit:"
+_TYPE_INDEX_KEYS = {t.value: b"audit_type:" + t.value.encode() for t in AuditEventType}
+_SEVERITY_INDEX_KEYS = {v.value: b"audit_severity:" + v.value.encode() for v in AuditSeverity}
+
+# Low severity events of these high-volume types go into the type and severity
+# indexes 1 time in N; every event is still written to the file, its own key,
+# the stream and the user's trail
+_INDEX_SAMPLE_RATES = {
+    AuditEventType.ACCESS_GRANTED.value: 10,
+    AuditEventType.DATA_ACCESS.value: 10,
+    AuditEventType.CONTENT_GENERATED.value: 5,
+}
+_LOW_SEVERITY = AuditSeverity.LOW.value
+
 class AuditLogger:
+    # Events are written by a background thread; when the queue is full,
+    # log_event falls back to writing on the calling thread
+    QUEUE_SIZE = 10000
+    BATCH_SIZE = 128
+    # Seconds between audit file flushes; critical records flush immediately
+    FLUSH_INTERVAL = 1.0
+    # Seconds to wait at interpreter exit for queued events to be written
+    SHUTDOWN_TIMEOUT = 10.0
+    # Capped stream of every event, newest last; each entry keeps the filter
+    # fields as separate columns next to the encoded record
+    STREAM_KEY = "audit_stream"
+    STREAM_MAXLEN = 100000
+    # Stream entries read per round trip when filtering a time range
+    STREAM_PAGE_SIZE = 500
+    # Security checks by event type value; other event types need no check
+    _ALERT_CHECKS = {
+        # Failed login attempts
+        AuditEventType.LOGIN_FAILED.value: lambda self, entry: (
+            self._check_failed_logins(entry.user_id, entry.ip_address)
+            if entry.user_id else None
+        ),
+        # Suspicious activity patterns
+        AuditEventType.SUSPICIOUS_ACTIVITY.value: lambda self, entry: (
+            self._raise_security_alert(entry, "Suspicious activity detected")
+        ),
+        # Rate limit violations
+        AuditEventType.RATE_LIMIT_EXCEEDED.value: lambda self, entry: (
+            self._check_rate_limit_violations(entry.ip_address)
+        ),
+        # Device fingerprint mismatches
+        AuditEventType.DEVICE_FINGERPRINT_MISMATCH.value: lambda self, entry: (
+            self._check_device_anomalies(entry.user_id)
+        ),
+    }
+    
     def __init__(self):
         self.logger = logging.getLogger('audit')
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', 6379)),
-            db=int(os.getenv('REDIS_AUDIT_DB', 2)),
-            decode_responses=True
-        )
+        self.redis_client = redis.Redis(connection_pool=_get_redis_pool())
         
         # Configure audit logger
         self._setup_audit_logger()
+        
+        # Windowed counters for the security alert checks
+        self._incr_window = self.redis_client.register_script(_INCR_WINDOW_SCRIPT)
+        
+        # Event ID state; the random suffix keeps IDs from separate processes apart
+        self._id_counter = itertools.count()
+        self._id_suffix = os.urandom(4).hex()
+        
+        # Start the background writer; queued events are written out on exit
+        # (e.g. worker recycling) before the daemon thread is killed
+        self._queue: queue.Queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._closed = False
+        self._writer = threading.Thread(target=self._drain_loop, name='audit-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
     
     def _setup_audit_logger(self):
         """Setup dedicated audit logger."""
@@ -79,17 +265,18 @@ class AuditLogger:
             audit_file = os.getenv('AUDIT_LOG_FILE', 'logs/audit.log')
             os.makedirs(os.path.dirname(audit_file), exist_ok=True)
             
-            file_handler = logging.FileHandler(audit_file)
+            file_handler = _BufferedFileHandler(audit_file)
             file_handler.setLevel(logging.INFO)
             
-            # JSON formatter for structured logs
-            formatter = logging.Formatter(
-                '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "message": %(message)s}'
-            )
-            file_handler.setFormatter(formatter)
-            
             self.logger.addHandler(file_handler)
             self.logger.setLevel(logging.INFO)
+        
+        # Audit lines are built as JSON bytes and written straight to the file
+        # handler, bypassing record formatting; None if the logger is set up elsewhere
+        self._sink = next(
+            (handler for handler in self.logger.handlers if isinstance(handler, _BufferedFileHandler)),
+            None
+        )
     
     def log_event(self, 
                   event_type: AuditEventType, 
@@ -101,112 +288,219 @@ class AuditLogger:
         """Log audit event with comprehensive details."""
         
         event_id = self._generate_event_id()
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = _now_iso()
         
         # Gather context information
         context = self._gather_context()
         
-        audit_entry = {
-            'event_id': event_id,
-            'timestamp': timestamp,
-            'event_type': event_type.value,
-            'severity': severity.value,
-            'user_id': user_id,
-            'session_id': getattr(g, 'session_id', None),
-            'ip_address': context.get('ip_address'),
-            'user_agent': context.get('user_agent'),
-            'endpoint': context.get('endpoint'),
-            'method': context.get('method'),
-            'resource': resource,
-            'outcome': outcome,
-            'details': details or {},
-            'request_id': getattr(g, 'request_id', None)
-        }
+        audit_entry = AuditEntry(
+            event_id=event_id,
+            timestamp=timestamp,
+            event_type=event_type.value,
+            severity=severity.value,
+            user_id=user_id,
+            session_id=getattr(g, 'session_id', None),
+            ip_address=context.get('ip_address'),
+            user_agent=context.get('user_agent'),
+            endpoint=context.get('endpoint'),
+            method=context.get('method'),
+            resource=resource,
+            outcome=outcome,
+            details=details or {},
+            request_id=getattr(g, 'request_id', None)
+        )
+        
+        # Encode once here so the writer thread only does I/O
+        payload = _dumps(audit_entry)
+        
+        if self._closed:
+            # Writer has stopped; write on the calling thread
+            self._write_batch([(audit_entry, payload)])
+            self._flush_file()
+            return event_id
+        
+        try:
+            self._queue.put_nowait((audit_entry, payload))
+        except queue.Full:
+            self._write_batch([(audit_entry, payload)])
+        
+        return event_id
+    
+    def flush(self) -> None:
+        """Block until every queued audit event has been written and flushed to disk."""
+        self._queue.join()
+        self._flush_file()
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background writer after it has written every queued event.
         
+        Args:
+            timeout: Seconds to wait for the writer; defaults to SHUTDOWN_TIMEOUT
+        """
+        if self._closed:
+            return
+        self._closed = True
+        timeout = self.SHUTDOWN_TIMEOUT if timeout is None else timeout
+        
+        try:
+            # The writer exits when it reaches this marker, after everything queued before it
+            self._queue.put(None, timeout=timeout)
+            self._writer.join(timeout)
+        except queue.Full:
+            logging.error("Audit writer did not drain its queue before shutdown")
+        self._flush_file()
+    
+    def _flush_file(self):
+        """Flush buffered audit log lines to the log file."""
+        for handler in self.logger.handlers:
+            handler.flush()
+    
+    def _drain_loop(self):
+        """Write queued audit events in batches, flushing the log file on an interval."""
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                self._flush_file()
+                last_flush = time.monotonic()
+                continue
+            
+            # None is the shutdown marker from close()
+            batch = []
+            taken = 1
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+            
+            while not stopping and len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                logging.error(f"Audit writer error: {str(e)}")
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+            
+            if stopping or time.monotonic() - last_flush >= self.FLUSH_INTERVAL:
+                self._flush_file()
+                last_flush = time.monotonic()
+    
+    def _write_batch(self, batch: List[Tuple[AuditEntry, bytes]]):
+        """Write encoded audit events to the log file and Redis, then run alert checks."""
         # Log to file
-        self.logger.info(json.dumps(audit_entry))
+        lines = [_log_line(audit_entry.timestamp, b'INFO', payload) for audit_entry, payload in batch]
+        if self._sink is not None:
+            self._sink.write_lines(b''.join(lines))
+        else:
+            for line in lines:
+                self.logger.info(line[:-1].decode())
         
         # Store in Redis for real-time monitoring
-        self._store_in_redis(audit_entry)
+        self._store_in_redis(batch)
         
         # Check for security alerts
-        self._check_security_alerts(audit_entry)
-        
-        return event_id
+        for audit_entry, _ in batch:
+            self._check_security_alerts(audit_entry)
     
     def _gather_context(self) -> Dict[str, Any]:
-        """Gather request context information."""
-        context = {}
+        """Gather request context information, once per request."""
+        if not has_request_context():
+            return {}
         
-        try:
-            if request:
-                context.update({
-                    'ip_address': request.remote_addr,
-                    'user_agent': request.headers.get('User-Agent', ''),
-                    'endpoint': request.endpoint,
-                    'method': request.method,
-                    'url': request.url,
-                    'referrer': request.headers.get('Referer', ''),
-                    'content_length': request.content_length,
-                    'content_type': request.content_type
-                })
-        except RuntimeError:
-            # Outside request context
-            pass
+        context = g.get('_audit_ctx')
+        if context is not None:
+            return context
         
+        # Resolve the proxy once and read from the concrete request
+        req = request._get_current_object()
+        context = {
+            'ip_address': req.remote_addr,
+            'user_agent': req.headers.get('User-Agent', ''),
+            'endpoint': req.endpoint,
+            'method': req.method,
+            'url': req.url,
+            'referrer': req.headers.get('Referer', ''),
+            'content_length': req.content_length,
+            'content_type': req.content_type
+        }
+        g._audit_ctx = context
         return context
     
-    def _store_in_redis(self, audit_entry: Dict[str, Any]):
-        """Store audit entry in Redis for real-time access."""
+    def _store_in_redis(self, batch: List[Tuple[AuditEntry, bytes]]):
+        """Store encoded audit entries in Redis for real-time access."""
         try:
-            # Store individual event
-            key = f"audit:{audit_entry['event_id']}"
-            self.redis_client.setex(key, 86400 * 7, json.dumps(audit_entry))  # 7 days
+            # Queue every write for the batch and send them in one round trip
+            pipe = self.redis_client.pipeline(transaction=False)
+            # Index key -> (last index kept, TTL, event IDs oldest first); each list
+            # gets one LPUSH/LTRIM/EXPIRE per batch however many events it receives
+            indexes: Dict[bytes, Tuple[int, int, List[bytes]]] = {}
             
-            # Add to user's audit trail
-            if audit_entry.get('user_id'):
-                user_key = f"user_audit:{audit_entry['user_id']}"
-                self.redis_client.lpush(user_key, audit_entry['event_id'])
-                self.redis_client.ltrim(user_key, 0, 999)  # Keep last 1000 events
-                self.redis_client.expire(user_key, 86400 * 30)  # 30 days
+            for audit_entry, payload in batch:
+                event_id = audit_entry.event_id.encode()
+                
+                # Store individual event
+                pipe.setex(_K_AUDIT + event_id, 86400 * 7, payload)  # 7 days
+                
+                # Append to the stream; trimming is approximate so Redis only
+                # drops whole nodes
+                pipe.xadd(self.STREAM_KEY, {
+                    'event_id': event_id,
+                    'event_type': audit_entry.event_type,
+                    'severity': audit_entry.severity,
+                    'user_id': audit_entry.user_id or '',
+                    'data': payload
+                }, maxlen=self.STREAM_MAXLEN, approximate=True)
+                
+                # Add to user's audit trail: last 1000 events, 30 days
+                if audit_entry.user_id:
+                    user_key = _K_USER_AUDIT + str(audit_entry.user_id).encode()
+                    indexes.setdefault(user_key, (999, 86400 * 30, []))[2].append(event_id)
+                
+                # Leave sampled-out routine events out of the shared indexes
+                rate = _INDEX_SAMPLE_RATES.get(audit_entry.event_type)
+                if rate and audit_entry.severity == _LOW_SEVERITY and hash(event_id) % rate:
+                    continue
+                
+                # Add to event type index: last 10000 events, 7 days
+                type_key = _TYPE_INDEX_KEYS[audit_entry.event_type]
+                indexes.setdefault(type_key, (9999, 86400 * 7, []))[2].append(event_id)
+                
+                # Add to severity index: last 10000 events, 7 days
+                severity_key = _SEVERITY_INDEX_KEYS[audit_entry.severity]
+                indexes.setdefault(severity_key, (9999, 86400 * 7, []))[2].append(event_id)
             
-            # Add to event type index
-            type_key = f"audit_type:{audit_entry['event_type']}"
-            self.redis_client.lpush(type_key, audit_entry['event_id'])
-            self.redis_client.ltrim(type_key, 0, 9999)  # Keep last 10000 events
-            self.redis_client.expire(type_key, 86400 * 7)  # 7 days
+            for index_key, (last_index, ttl, event_ids) in indexes.items():
+                pipe.lpush(index_key, *event_ids)
+                pipe.ltrim(index_key, 0, last_index)
+                pipe.expire(index_key, ttl)
+            pipe.expire(self.STREAM_KEY, 86400 * 7)
             
-            # Add to severity index
-            severity_key = f"audit_severity:{audit_entry['severity']}"
-            self.redis_client.lpush(severity_key, audit_entry['event_id'])
-            self.redis_client.ltrim(severity_key, 0, 9999)
-            self.redis_client.expire(severity_key, 86400 * 7)
+            pipe.execute()
             
         except Exception as e:
-            logging.error(f"Failed to store audit entry in Redis: {str(e)}")
+            logging.error(f"Failed to store audit entries in Redis: {str(e)}")
     
-    def _check_security_alerts(self, audit_entry: Dict[str, Any]):
+    def _check_security_alerts(self, audit_entry: AuditEntry):
         """Check for security patterns and raise alerts."""
         try:
-            event_type = audit_entry['event_type']
-            user_id = audit_entry.get('user_id')
-            ip_address = audit_entry.get('ip_address')
-            
-            # Failed login attempts
-            if event_type == AuditEventType.LOGIN_FAILED.value and user_id:
-                self._check_failed_logins(user_id, ip_address)
-            
-            # Suspicious activity patterns
-            if event_type == AuditEventType.SUSPICIOUS_ACTIVITY.value:
-                self._raise_security_alert(audit_entry, "Suspicious activity detected")
-            
-            # Rate limit violations
-            if event_type == AuditEventType.RATE_LIMIT_EXCEEDED.value:
-                self._check_rate_limit_violations(ip_address)
-            
-            # Device fingerprint mismatches
-            if event_type == AuditEventType.DEVICE_FINGERPRINT_MISMATCH.value:
-                self._check_device_anomalies(user_id)
+            check = self._ALERT_CHECKS.get(audit_entry.event_type)
+            if check:
+                check(self, audit_entry)
                 
         except Exception as e:
             logging.error(f"Security alert check failed: {str(e)}")
@@ -214,10 +508,11 @@ class AuditLogger:
     def _check_failed_logins(self, user_id: str, ip_address: str):
         """Check for excessive failed login attempts."""
         try:
-            # Count failed logins in last hour
-            failed_key = f"failed_logins:{user_id}"
-            failed_count = self.redis_client.incr(failed_key)
-            self.redis_client.expire(failed_key, 3600)  # 1 hour
+            # Count failed logins in last hour, per user and per IP, in one round trip
+            failed_count, ip_failed_count = self._incr_window(
+                keys=[f"failed_logins:{user_id}", f"ip_failed_logins:{ip_address}"],
+                args=[3600]  # 1 hour
+            )
             
             if failed_count >= 5:
                 alert_details = {
@@ -229,10 +524,6 @@ class AuditLogger:
                 self._raise_security_alert(alert_details, "Excessive failed login attempts")
             
             # Check for distributed attacks from same IP
-            ip_failed_key = f"ip_failed_logins:{ip_address}"
-            ip_failed_count = self.redis_client.incr(ip_failed_key)
-            self.redis_client.expire(ip_failed_key, 3600)
-            
             if ip_failed_count >= 10:
                 alert_details = {
                     'ip_address': ip_address,
@@ -248,8 +539,7 @@ class AuditLogger:
         """Check for persistent rate limit violations."""
         try:
             violations_key = f"rate_violations:{ip_address}"
-            violation_count = self.redis_client.incr(violations_key)
-            self.redis_client.expire(violations_key, 3600)  # 1 hour
+            violation_count = self._incr_window(keys=[violations_key], args=[3600])[0]  # 1 hour
             
             if violation_count >= 10:
                 alert_details = {
@@ -266,8 +556,7 @@ class AuditLogger:
         """Check for unusual device activity."""
         try:
             anomaly_key = f"device_anomalies:{user_id}"
-            anomaly_count = self.redis_client.incr(anomaly_key)
-            self.redis_client.expire(anomaly_key, 3600)  # 1 hour
+            anomaly_count = self._incr_window(keys=[anomaly_key], args=[3600])[0]  # 1 hour
             
             if anomaly_count >= 3:
                 alert_details = {
@@ -280,46 +569,55 @@ class AuditLogger:
         except Exception as e:
             logging.error(f"Device anomaly check error: {str(e)}")
     
-    def _raise_security_alert(self, details: Dict[str, Any], message: str):
+    def _raise_security_alert(self, details: Union[AuditEntry, Dict[str, Any]], message: str):
         """Raise security alert."""
         alert_id = self._generate_event_id()
         alert = {
             'alert_id': alert_id,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'timestamp': _now_iso(),
             'message': message,
             'severity': 'high',
             'details': details,
             'status': 'active'
         }
         
-        # Store alert
+        # Store alert and add it to the alerts list in one round trip
         alert_key = f"security_alert:{alert_id}"
-        self.redis_client.setex(alert_key, 86400 * 7, json.dumps(alert))
-        
-        # Add to alerts list
-        self.redis_client.lpush("security_alerts", alert_id)
-        self.redis_client.ltrim("security_alerts", 0, 999)  # Keep last 1000 alerts
+        alert_payload = _dumps(alert)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.setex(alert_key, 86400 * 7, alert_payload)
+        pipe.lpush("security_alerts", alert_id)
+        pipe.ltrim("security_alerts", 0, 999)  # Keep last 1000 alerts
+        pipe.execute()
         
-        # Log critical alert
-        self.logger.critical(json.dumps(alert))
+        # Log critical alert, flushed immediately
+        line = _log_line(alert['timestamp'], b'CRITICAL', alert_payload)
+        if self._sink is not None:
+            self._sink.write_lines(line, flush=True)
+        else:
+            self.logger.critical(line[:-1].decode())
     
     def _generate_event_id(self) -> str:
-        """Generate unique event ID."""
-        import uuid
-        return str(uuid.uuid4())
+        """
+        Generate a unique, time-ordered event ID.
+        
+        Nanosecond timestamp, a per-logger counter and a per-logger random
+        suffix, all hex; IDs from one logger sort in creation order.
+        """
+        return f"{time.time_ns():016x}{next(self._id_counter) & 0xffff:04x}{self._id_suffix}"
     
     def get_user_audit_trail(self, user_id: str, limit: int = 100) -> list:
         """Get audit trail for specific user."""
         try:
             user_key = f"user_audit:{user_id}"
             event_ids = self.redis_client.lrange(user_key, 0, limit - 1)
+            if not event_ids:
+                return []
             
             events = []
-            for event_id in event_ids:
-                event_key = f"audit:{event_id}"
-                event_data = self.redis_client.get(event_key)
+            for event_data in self.redis_client.mget([f"audit:{event_id}" for event_id in event_ids]):
                 if event_data:
-                    events.append(json.loads(event_data))
+                    events.append(orjson.loads(event_data))
             
             return events
             
@@ -331,13 +629,13 @@ class AuditLogger:
         """Get security alerts."""
         try:
             alert_ids = self.redis_client.lrange("security_alerts", 0, limit - 1)
+            if not alert_ids:
+                return []
             
             alerts = []
-            for alert_id in alert_ids:
-                alert_key = f"security_alert:{alert_id}"
-                alert_data = self.redis_client.get(alert_key)
+            for alert_data in self.redis_client.mget([f"security_alert:{alert_id}" for alert_id in alert_ids]):
                 if alert_data:
-                    alert = json.loads(alert_data)
+                    alert = orjson.loads(alert_data)
                     if severity is None or alert.get('severity') == severity:
                         alerts.append(alert)
             
@@ -358,37 +656,71 @@ class AuditLogger:
             # This is a simplified implementation
             # In production, you'd want to use a proper search engine like Elasticsearch
             
+            if start_time is not None or end_time is not None or not (event_type or user_id):
+                return self._search_stream(event_type, user_id, start_time, end_time, limit)
+            
             if event_type:
                 event_ids = self.redis_client.lrange(f"audit_type:{event_type}", 0, limit - 1)
-            elif user_id:
-                event_ids = self.redis_client.lrange(f"user_audit:{user_id}", 0, limit - 1)
             else:
-                # Get recent events from all types
-                event_ids = []
-                for event_type_enum in AuditEventType:
-                    type_events = self.redis_client.lrange(f"audit_type:{event_type_enum.value}", 0, 10)
-                    event_ids.extend(type_events)
-                event_ids = event_ids[:limit]
+                event_ids = self.redis_client.lrange(f"user_audit:{user_id}", 0, limit - 1)
+            
+            if not event_ids:
+                return []
             
             events = []
-            for event_id in event_ids:
-                event_key = f"audit:{event_id}"
-                event_data = self.redis_client.get(event_key)
+            for event_data in self.redis_client.mget([f"audit:{event_id}" for event_id in event_ids]):
                 if event_data:
-                    event = json.loads(event_data)
-                    
-                    # Apply time filters
-                    if start_time or end_time:
-                        event_time = datetime.fromisoformat(event['timestamp'].replace('Z', '+00:00'))
-                        if start_time and event_time < start_time:
-                            continue
-                        if end_time and event_time > end_time:
-                            continue
-                    
-                    events.append(event)
+                    events.append(orjson.loads(event_data))
             
             return events
             
         except Exception as e:
             logging.error(f"Search audit logs error: {str(e)}")
             return []
+    
+    def _search_stream(self,
+                       event_type: Optional[str],
+                       user_id: Optional[str],
+                       start_time: Optional[datetime],
+                       end_time: Optional[datetime],
+                       limit: int) -> list:
+        """
+        Read the newest matching events from the audit stream.
+        
+        Stream IDs start with the Redis time in milliseconds, so the time range
+        maps straight onto XREVRANGE bounds. Type and user filters are checked
+        against the entry's own fields and only matching records are decoded.
+        
+        Args:
+            event_type: Event type to match, if any
+            user_id: User ID to match, if any
+            start_time: Earliest event time, if any
+            end_time: Latest event time, if any
+            limit: Maximum number of events to return
+            
+        Returns:
+            Matching audit entries, newest first
+        """
+        upper = str(int(_epoch(end_time) * 1000)) if end_time else '+'
+        lower = str(int(_epoch(start_time) * 1000)) if start_time else '-'
+        filtered = bool(event_type or user_id)
+        count = max(limit, self.STREAM_PAGE_SIZE) if filtered else limit
+        
+        events = []
+        while len(events) < limit:
+            entries = self.redis_client.xrevrange(self.STREAM_KEY, upper, lower, count=count)
+            for _, fields in entries:
+                if event_type and fields.get('event_type') != event_type:
+                    continue
+                if user_id and fields.get('user_id') != user_id:
+                    continue
+                events.append(orjson.loads(fields['data']))
+                if len(events) >= limit:
+                    break
+            
+            if len(entries) < count:
+                break
+            # Continue below the oldest entry read so far
+            upper = '(' + entries[-1][0]
+        
+        return events
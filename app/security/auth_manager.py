@@ -8,23 +8,69 @@ import jwt
 import redis
 import hashlib
 import secrets
+import threading
+import time
 import pyotp
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, Tuple
 from cryptography.fernet import Fernet
-from flask import request, current_app
+from flask import request, current_app, g
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Shared by every AuthManager so instances do not each open their own connections
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+def _get_redis_pool() -> redis.BlockingConnectionPool:
+    """Get the process-wide auth Redis connection pool, creating it on first use."""
+    global _redis_pool
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                _redis_pool = redis.BlockingConnectionPool(
+                    host=os.getenv('REDIS_HOST', 'localhost'),
+                    port=int(os.getenv('REDIS_PORT', 6379)),
+                    db=int(os.getenv('REDIS_AUTH_DB', 1)),
+                    max_connections=int(os.getenv('REDIS_AUTH_MAX_CONNECTIONS', 32)),
+                    timeout=5,  # Seconds to wait for a free connection
+                    decode_responses=True
+                )
+    return _redis_pool
+
+# Rotate a session's refresh token if the presented one is still current.
+# KEYS: session, old refresh token, new refresh token, user session index,
+#       session expiry index
+# ARGV: old refresh JTI, new refresh JTI, new access JTI, last activity,
+#       refresh token TTL, session ID, session TTL, session expiry epoch
+# Returns 1 on rotation, 0 if the refresh token was already used
+_ROTATE_REFRESH_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'refresh_jti') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[1], 'refresh_jti', ARGV[2], 'access_jti', ARGV[3], 'last_activity', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[7])
+redis.call('SETEX', KEYS[3], ARGV[5], ARGV[6])
+redis.call('EXPIRE', KEYS[4], ARGV[7])
+redis.call('ZADD', KEYS[5], ARGV[8], ARGV[6])
+return 1
+"""
+
 class AuthManager:
+    # Sorted set of session IDs scored by the epoch time their session expires
+    SESSION_EXPIRY_KEY = "session_expiries"
+    # Set once sessions from before the per-user session index have been indexed
+    SESSION_INDEX_BACKFILL_KEY = "session_index_backfilled"
+    # Seconds between last_activity writes for the same session; the field is
+    # informational, so it may lag by up to this much
+    LAST_ACTIVITY_INTERVAL = 30
+    # Sessions tracked before stale throttle entries are pruned
+    LAST_ACTIVITY_TRACKED = 10000
+    
     def __init__(self):
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', 6379)),
-            db=int(os.getenv('REDIS_AUTH_DB', 1)),
-            decode_responses=True
-        )
+        self.redis_client = redis.Redis(connection_pool=_get_redis_pool())
         self.secret_key = os.getenv('JWT_SECRET_KEY')
         self.encryption_key = os.getenv('ENCRYPTION_KEY', Fernet.generate_key())
         self.fernet = Fernet(self.encryption_key)
@@ -34,10 +80,21 @@ class AuthManager:
         self.refresh_token_expiry = timedelta(days=7)     # Longer-lived
         self.device_session_expiry = timedelta(days=30)
         
+        self._rotate_refresh = self.redis_client.register_script(_ROTATE_REFRESH_SCRIPT)
+        # session_id -> monotonic time of the last last_activity write from this process
+        self._activity_written: Dict[str, float] = {}
+        self._backfill_session_index()
+        
     def generate_device_fingerprint(self, user_agent: str, ip_address: str) -> str:
-        """Generate unique device fingerprint."""
+        """Generate unique device fingerprint, hashed at most once per request."""
         fingerprint_data = f"{user_agent}:{ip_address}:{request.headers.get('Accept-Language', '')}"
-        return hashlib.sha256(fingerprint_data.encode()).hexdigest()
+        cached = g.get('_device_fp')
+        if cached is not None and cached[0] == fingerprint_data:
+            return cached[1]
+        
+        fingerprint = hashlib.sha256(fingerprint_data.encode()).hexdigest()
+        g._device_fp = (fingerprint_data, fingerprint)
+        return fingerprint
     
     def create_tokens(self, user_id: str, device_fingerprint: str, 
                      permissions: list = None) -> Dict[str, Any]:
@@ -47,6 +104,61 @@ class AuthManager:
         # Generate unique session ID
         session_id = secrets.token_urlsafe(32)
         
+        tokens, access_jti, refresh_jti = self._issue_tokens(
+            user_id, session_id, device_fingerprint, permissions, now
+        )
+        
+        # Store session in Redis
+        session_data = {
+            'user_id': user_id,
+            'device_fingerprint': device_fingerprint,
+            'created_at': now.isoformat(),
+            'last_activity': now.isoformat(),
+            'permissions': ','.join(permissions or []),
+            'is_active': 'true',
+            'access_jti': access_jti,
+            'refresh_jti': refresh_jti
+        }
+        
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            # Store session with expiry
+            pipe.hset(f"session:{session_id}", mapping=session_data)
+            pipe.expire(f"session:{session_id}", int(self.device_session_expiry.total_seconds()))
+            
+            # Store refresh token mapping
+            pipe.setex(
+                f"refresh_token:{refresh_jti}", 
+                int(self.refresh_token_expiry.total_seconds()),
+                session_id
+            )
+            
+            # Index the session under its user; the set lives as long as the newest session
+            pipe.sadd(f"user_sessions:{user_id}", session_id)
+            pipe.expire(f"user_sessions:{user_id}", int(self.device_session_expiry.total_seconds()))
+            
+            # Record when the session expires for cleanup
+            pipe.zadd(self.SESSION_EXPIRY_KEY, {
+                session_id: time.time() + self.device_session_expiry.total_seconds()
+            })
+            pipe.execute()
+        
+        return tokens
+    
+    def _issue_tokens(self, user_id: str, session_id: str, device_fingerprint: str,
+                      permissions: Optional[list], now: datetime) -> Tuple[Dict[str, Any], str, str]:
+        """
+        Sign a new access and refresh token pair for a session.
+        
+        Args:
+            user_id: User the tokens are issued to
+            session_id: Session the tokens belong to
+            device_fingerprint: Fingerprint of the issuing device
+            permissions: Permissions carried by the access token
+            now: Issue time
+            
+        Returns:
+            Tuple of (token response, access token JTI, refresh token JTI)
+        """
         # Access token payload
         access_payload = {
             'user_id': user_id,
@@ -74,36 +186,14 @@ class AuthManager:
         access_token = jwt.encode(access_payload, self.secret_key, algorithm='HS256')
         refresh_token = jwt.encode(refresh_payload, self.secret_key, algorithm='HS256')
         
-        # Store session in Redis
-        session_data = {
-            'user_id': user_id,
-            'device_fingerprint': device_fingerprint,
-            'created_at': now.isoformat(),
-            'last_activity': now.isoformat(),
-            'permissions': ','.join(permissions or []),
-            'is_active': 'true',
-            'access_jti': access_payload['jti'],
-            'refresh_jti': refresh_payload['jti']
-        }
-        
-        # Store session with expiry
-        self.redis_client.hset(f"session:{session_id}", mapping=session_data)
-        self.redis_client.expire(f"session:{session_id}", int(self.device_session_expiry.total_seconds()))
-        
-        # Store refresh token mapping
-        self.redis_client.setex(
-            f"refresh_token:{refresh_payload['jti']}", 
-            int(self.refresh_token_expiry.total_seconds()),
-            session_id
-        )
-        
-        return {
+        tokens = {
             'access_token': access_token,
             'refresh_token': refresh_token,
             'session_id': session_id,
             'expires_in': int(self.access_token_expiry.total_seconds()),
             'token_type': 'Bearer'
         }
+        return tokens, access_payload['jti'], refresh_payload['jti']
     
     def verify_token(self, token: str, token_type: str = 'access') -> Tuple[bool, Dict[str, Any], str]:
         """Verify and decode JWT token."""
@@ -131,8 +221,9 @@ class AuthManager:
                 logger.warning(f"Device fingerprint mismatch for user {payload.get('user_id')}")
                 # Don't fail completely, but log for security monitoring
             
-            # Update last activity
-            self.redis_client.hset(f"session:{session_id}", 'last_activity', datetime.utcnow().isoformat())
+            # Update last activity, at most once per interval per session
+            if self._should_record_activity(session_id):
+                self.redis_client.hset(f"session:{session_id}", 'last_activity', datetime.utcnow().isoformat())
             
             return True, payload, ""
             
@@ -144,6 +235,21 @@ class AuthManager:
             logger.error(f"Token verification error: {str(e)}")
             return False, {}, "Token verification failed"
     
+    def _should_record_activity(self, session_id: str) -> bool:
+        """Check whether a session's last_activity is due to be written, marking it if so."""
+        now = time.monotonic()
+        last = self._activity_written.get(session_id)
+        if last is not None and now - last < self.LAST_ACTIVITY_INTERVAL:
+            return False
+        
+        if len(self._activity_written) >= self.LAST_ACTIVITY_TRACKED:
+            cutoff = now - self.LAST_ACTIVITY_INTERVAL
+            self._activity_written = {
+                sid: written for sid, written in self._activity_written.items() if written > cutoff
+            }
+        self._activity_written[session_id] = now
+        return True
+    
     def refresh_tokens(self, refresh_token: str) -> Tuple[bool, Dict[str, Any], str]:
         """Refresh access token using refresh token with rotation."""
         try:
@@ -152,27 +258,37 @@ class AuthManager:
             if not valid:
                 return False, {}, error
             
-            # Get session data
-            session_id = payload.get('session_id')
-            session_data = self.redis_client.hgetall(f"session:{session_id}")
-            
-            if not session_data:
-                return False, {}, "Session not found"
-            
-            # Verify refresh token JTI matches stored value
-            if session_data.get('refresh_jti') != payload.get('jti'):
-                return False, {}, "Refresh token already used"
-            
-            # Generate new tokens (token rotation)
+            # Issue a new token pair for the same session (token rotation)
+            session_id = payload['session_id']
             user_id = payload['user_id']
-            device_fingerprint = payload['device_fingerprint']
-            permissions = payload.get('permissions', [])
-            
-            new_tokens = self.create_tokens(user_id, device_fingerprint, permissions)
+            now = datetime.utcnow()
+            new_tokens, access_jti, refresh_jti = self._issue_tokens(
+                user_id, session_id, payload['device_fingerprint'],
+                payload.get('permissions', []), now
+            )
             
-            # Invalidate old refresh token
-            old_refresh_jti = payload.get('jti')
-            self.redis_client.delete(f"refresh_token:{old_refresh_jti}")
+            # Swap the stored refresh token atomically so it can only be used once
+            rotated = self._rotate_refresh(
+                keys=[
+                    f"session:{session_id}",
+                    f"refresh_token:{payload.get('jti')}",
+                    f"refresh_token:{refresh_jti}",
+                    f"user_sessions:{user_id}",
+                    self.SESSION_EXPIRY_KEY
+                ],
+                args=[
+                    payload.get('jti'),
+                    refresh_jti,
+                    access_jti,
+                    now.isoformat(),
+                    int(self.refresh_token_expiry.total_seconds()),
+                    session_id,
+                    int(self.device_session_expiry.total_seconds()),
+                    time.time() + self.device_session_expiry.total_seconds()
+                ]
+            )
+            if not rotated:
+                return False, {}, "Refresh token already used"
             
             return True, new_tokens, "Tokens refreshed successfully"
             
@@ -192,13 +308,18 @@ class AuthManager:
             if user_id and session_data.get('user_id') != user_id:
                 return False
             
-            # Mark session as inactive
-            self.redis_client.hset(f"session:{session_id}", 'is_active', 'false')
-            
-            # Remove refresh token
-            refresh_jti = session_data.get('refresh_jti')
-            if refresh_jti:
-                self.redis_client.delete(f"refresh_token:{refresh_jti}")
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                # Mark session as inactive
+                pipe.hset(f"session:{session_id}", 'is_active', 'false')
+                
+                # Remove refresh token
+                refresh_jti = session_data.get('refresh_jti')
+                if refresh_jti:
+                    pipe.delete(f"refresh_token:{refresh_jti}")
+                
+                # Drop it from the user's session index
+                pipe.srem(f"user_sessions:{session_data.get('user_id')}", session_id)
+                pipe.execute()
             
             return True
             
@@ -212,14 +333,8 @@ class AuthManager:
             revoked_count = 0
             
             # Find all sessions for user
-            pattern = "session:*"
-            for key in self.redis_client.scan_iter(match=pattern):
-                session_data = self.redis_client.hgetall(key)
-                
-                if (session_data.get('user_id') == user_id and 
-                    session_data.get('is_active') == 'true'):
-                    
-                    session_id = key.split(':')[1]
+            for session_id, session_data in self._get_user_sessions(user_id):
+                if session_data.get('is_active') == 'true':
                     
                     # Skip the exception session
                     if except_session and session_id == except_session:
@@ -301,12 +416,14 @@ class AuthManager:
             if not totp.verify(verification_token, valid_window=1):
                 return False
             
-            # Move secret to permanent storage
-            self.redis_client.set(f"mfa_secret:{user_id}", encrypted_secret)
-            self.redis_client.delete(f"mfa_setup:{user_id}")
-            
-            # Mark MFA as enabled
-            self.redis_client.set(f"mfa_enabled:{user_id}", "true")
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                # Move secret to permanent storage
+                pipe.set(f"mfa_secret:{user_id}", encrypted_secret)
+                pipe.delete(f"mfa_setup:{user_id}")
+                
+                # Mark MFA as enabled
+                pipe.set(f"mfa_enabled:{user_id}", "true")
+                pipe.execute()
             
             return True
             
@@ -347,16 +464,12 @@ class AuthManager:
         """Get all active sessions for a user."""
         try:
             sessions = []
-            pattern = "session:*"
             
-            for key in self.redis_client.scan_iter(match=pattern):
-                session_data = self.redis_client.hgetall(key)
-                
-                if (session_data.get('user_id') == user_id and 
-                    session_data.get('is_active') == 'true'):
+            for session_id, session_data in self._get_user_sessions(user_id):
+                if session_data.get('is_active') == 'true':
                     
                     sessions.append({
-                        'session_id': key.split(':')[1],
+                        'session_id': session_id,
                         'device_fingerprint': session_data.get('device_fingerprint'),
                         'created_at': session_data.get('created_at'),
                         'last_activity': session_data.get('last_activity')
@@ -368,20 +481,95 @@ class AuthManager:
             logger.error(f"Get active sessions error: {str(e)}")
             return []
     
-    def cleanup_expired_sessions(self) -> int:
-        """Clean up expired sessions (run periodically)."""
+    def _get_user_sessions(self, user_id: str) -> list:
+        """
+        Load the sessions indexed under a user.
+        
+        Session IDs whose session has expired are removed from the index.
+        
+        Args:
+            user_id: User whose sessions to load
+            
+        Returns:
+            List of (session_id, session_data) tuples
+        """
+        index_key = f"user_sessions:{user_id}"
+        sessions = []
+        expired = []
+        
+        session_ids = list(self.redis_client.smembers(index_key))
+        if not session_ids:
+            return sessions
+        
+        # Fetch every session hash in one round trip
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.hgetall(f"session:{session_id}")
+            session_datas = pipe.execute()
+        
+        for session_id, session_data in zip(session_ids, session_datas):
+            if session_data:
+                sessions.append((session_id, session_data))
+            else:
+                expired.append(session_id)
+        
+        if expired:
+            self.redis_client.srem(index_key, *expired)
+        
+        return sessions
+    
+    def _backfill_session_index(self) -> None:
+        """
+        Index active sessions created before the per-user session index existed.
+        
+        Runs once per Redis database: the first AuthManager to claim the flag
+        key scans session:* and adds every active session to its user's index.
+        Afterwards an empty index simply means the user has no sessions.
+        """
         try:
-            cleaned = 0
-            pattern = "session:*"
+            if not self.redis_client.set(self.SESSION_INDEX_BACKFILL_KEY, '1', nx=True):
+                return
+            
+            index_expiry = int(self.device_session_expiry.total_seconds())
+            indexed = 0
+            for key in self.redis_client.scan_iter(match="session:*"):
+                session_data = self.redis_client.hgetall(key)
+                user_id = session_data.get('user_id')
+                if not user_id or session_data.get('is_active') != 'true':
+                    continue
+                
+                index_key = f"user_sessions:{user_id}"
+                with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.sadd(index_key, key.split(':', 1)[1])
+                    pipe.expire(index_key, index_expiry)
+                    pipe.execute()
+                indexed += 1
             
-            for key in self.redis_client.scan_iter(match=pattern):
-                # Redis TTL will handle automatic cleanup
-                # This is for manual cleanup if needed
-                if self.redis_client.ttl(key) <= 0:
-                    self.redis_client.delete(key)
-                    cleaned += 1
+            logger.info(f"Indexed {indexed} existing sessions")
             
-            return cleaned
+        except Exception as e:
+            logger.error(f"Session index backfill error: {str(e)}")
+            # Let a later start retry the backfill
+            try:
+                self.redis_client.delete(self.SESSION_INDEX_BACKFILL_KEY)
+            except Exception:
+                pass
+    
+    def cleanup_expired_sessions(self) -> int:
+        """Clean up expired sessions (run periodically)."""
+        try:
+            # Sessions past their expiry time; Redis TTL normally removes the
+            # hashes already, this clears any left behind and the index entries
+            expired = self.redis_client.zrangebyscore(self.SESSION_EXPIRY_KEY, 0, time.time())
+            if not expired:
+                return 0
+            
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(*[f"session:{session_id}" for session_id in expired])
+                pipe.zrem(self.SESSION_EXPIRY_KEY, *expired)
+                pipe.execute()
+            
+            return len(expired)
             
         except Exception as e:
             logger.error(f"Session cleanup error: {str(e)}")
@@ -4,11 +4,14 @@ Manages WebSocket connections, rooms, and real-time communication.
 """
 
 import logging
+import sys
 import uuid
 import json
 from typing import Dict, List, Optional, Set, Any
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
+from functools import lru_cache
+from itertools import islice
 import redis
 from flask import current_app
 from flask_socketio import emit, join_room, leave_room, disconnect
@@ -21,17 +24,31 @@ from app.models.websocket_models import (
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def _warn_once(message: str) -> None:
+    """Log a warning the first time a given message comes up in this process."""
+    logger.warning(message)
+
 class WebSocketManager:
     """Manages WebSocket connections and real-time features."""
     
-    def __init__(self, redis_client: Optional[redis.Redis] = None):
-        """Initialize WebSocket manager."""
+    def __init__(self, redis_client: Optional[redis.Redis] = None, socketio: Optional[Any] = None):
+        """
+        Initialize WebSocket manager.
+        
+        Args:
+            redis_client: Optional Redis client
+            socketio: SocketIO instance used for emits made outside a Socket.IO
+                event context (e.g. from background workers)
+        """
         self.redis_client = redis_client
+        self.socketio = socketio
         
         # In-memory storage (consider Redis for production scaling)
         self.connections: Dict[str, ConnectionInfo] = {}  # socket_id -> connection_info
         self.user_sockets: Dict[str, Set[str]] = defaultdict(set)  # user_id -> socket_ids
         self.rooms: Dict[str, Room] = {}  # room_id -> room
+        self.socket_rooms: Dict[str, Set[str]] = defaultdict(set)  # socket_id -> joined room_ids
         self.message_queues: Dict[str, deque] = defaultdict(deque)  # user_id -> queued_messages
         self.rate_limits: Dict[str, Dict[str, RateLimitInfo]] = defaultdict(dict)  # user_id -> event_type -> rate_limit
         
@@ -62,7 +79,7 @@ class WebSocketManager:
         self.connections[socket_id] = connection
         self.user_sockets[user_id].add(socket_id)
         
-        logger.info(f"WebSocket connection added: user={user_id}, socket={socket_id}")
+        logger.info("WebSocket connection added: user=%s, socket=%s", user_id, socket_id)
         return connection
     
     def remove_connection(self, socket_id: str) -> Optional[ConnectionInfo]:
@@ -76,7 +93,7 @@ class WebSocketManager:
             # Remove user from all rooms
             self._remove_user_from_all_rooms(connection.user_id, socket_id)
             
-            logger.info(f"WebSocket connection removed: user={connection.user_id}, socket={socket_id}")
+            logger.info("WebSocket connection removed: user=%s, socket=%s", connection.user_id, socket_id)
         return connection
     
     def get_connection(self, socket_id: str) -> Optional[ConnectionInfo]:
@@ -98,6 +115,7 @@ class WebSocketManager:
     def create_room(self, room_id: str, name: str, room_type: RoomType, 
                    created_by: str, settings: Optional[Dict[str, Any]] = None) -> Room:
         """Create a new room."""
+        room_id = sys.intern(room_id)  # Stored keys match interned handler IDs by identity
         room = Room(
             id=room_id,
             name=name,
@@ -110,7 +128,7 @@ class WebSocketManager:
         room.permissions[created_by] = ['admin', 'read', 'write', 'invite']
         
         self.rooms[room_id] = room
-        logger.info(f"Room created: {room_id} by {created_by}")
+        logger.info("Room created: %s by %s", room_id, created_by)
         return room
     
     def get_room(self, room_id: str) -> Optional[Room]:
@@ -139,6 +157,7 @@ class WebSocketManager:
         
         # Add user to room
         room.add_user(ws_user)
+        self.socket_rooms[socket_id].add(room_id)
         
         # Join SocketIO room
         join_room(room_id)
@@ -146,13 +165,13 @@ class WebSocketManager:
         # Emit user joined event
         self._emit_to_room(room_id, EventType.USER_JOINED, {
             'user': ws_user.to_dict(),
-            'room': room.to_dict()
+            'room': room.cached_dict()
         }, exclude_user=connection.user_id)
         
         # Deliver queued messages
         self._deliver_queued_messages(connection.user_id)
         
-        logger.info(f"User {connection.user_id} joined room {room_id}")
+        logger.info("User %s joined room %s", connection.user_id, room_id)
         return True
     
     def leave_room_ws(self, socket_id: str, room_id: str) -> bool:
@@ -166,6 +185,9 @@ class WebSocketManager:
             return False
         
         user = room.remove_user(connection.user_id)
+        rooms = self.socket_rooms.get(socket_id)
+        if rooms is not None:
+            rooms.discard(room_id)
         if user:
             # Leave SocketIO room
             leave_room(room_id)
@@ -177,14 +199,15 @@ class WebSocketManager:
                 'remaining_users': room.get_user_count()
             })
             
-            logger.info(f"User {connection.user_id} left room {room_id}")
+            logger.info("User %s left room %s", connection.user_id, room_id)
             return True
         return False
     
     def _remove_user_from_all_rooms(self, user_id: str, socket_id: str) -> None:
-        """Remove user from all rooms."""
-        for room in self.rooms.values():
-            if user_id in room.active_users:
+        """Remove user from all rooms joined through the given socket."""
+        for room_id in self.socket_rooms.pop(socket_id, ()):
+            room = self.rooms.get(room_id)
+            if room and user_id in room.active_users:
                 room.remove_user(user_id)
                 self._emit_to_room(room.id, EventType.USER_LEFT, {
                     'user_id': user_id,
@@ -235,7 +258,7 @@ class WebSocketManager:
         # Queue for offline users
         self._queue_message_for_offline_users(room, message)
         
-        logger.info(f"Message sent: {message.id} in room {room_id}")
+        logger.debug("Message sent: %s in room %s", message.id, room_id)
         return message
     
     def handle_typing(self, socket_id: str, room_id: str, is_typing: bool) -> bool:
@@ -299,19 +322,29 @@ class WebSocketManager:
     def update_cursor_position(self, socket_id: str, room_id: str, x: float, y: float,
                               element_id: Optional[str] = None, 
                               selection_start: Optional[int] = None,
-                              selection_end: Optional[int] = None) -> bool:
-        """Update user cursor position."""
+                              selection_end: Optional[int] = None,
+                              broadcast: bool = True) -> Optional[CursorPosition]:
+        """
+        Update user cursor position.
+        
+        Args:
+            broadcast: Emit the update to the room immediately; callers that batch
+                cursor updates pass False and broadcast the returned position later
+                
+        Returns:
+            The stored cursor position, or None if the update was rejected
+        """
         connection = self.get_connection(socket_id)
         if not connection:
-            return False
+            return None
         
         room = self.get_room(room_id)
         if not room or connection.user_id not in room.active_users:
-            return False
+            return None
         
         # Check rate limits
         if not self._check_rate_limit(connection.user_id, EventType.CURSOR_MOVED):
-            return False
+            return None
         
         cursor_pos = CursorPosition(
             user_id=connection.user_id,
@@ -326,15 +359,23 @@ class WebSocketManager:
         room.cursor_positions[connection.user_id] = cursor_pos
         
         # Emit cursor position update
-        self._emit_to_room(room_id, EventType.CURSOR_MOVED, {
-            'cursor': cursor_pos.to_dict()
-        }, exclude_user=connection.user_id)
+        if broadcast:
+            self._emit_to_room(room_id, EventType.CURSOR_MOVED, {
+                'cursor': cursor_pos.to_dict()
+            }, exclude_user=connection.user_id)
         
-        return True
+        return cursor_pos
     
     def handle_plan_update(self, socket_id: str, room_id: str, operation: str,
-                          target_type: str, target_id: str, changes: Dict[str, Any]) -> bool:
-        """Handle collaborative plan updates."""
+                          target_type: str, target_id: str, changes: Dict[str, Any],
+                          namespace: Optional[str] = None) -> bool:
+        """
+        Handle collaborative plan updates.
+        
+        Args:
+            namespace: Socket.IO namespace to emit on; required when called outside
+                an event handler, such as from a background worker
+        """
         connection = self.get_connection(socket_id)
         if not connection:
             return False
@@ -347,7 +388,7 @@ class WebSocketManager:
         if not room.has_permission(connection.user_id, 'write'):
             self._emit_to_user(connection.user_id, EventType.ERROR_OCCURRED, {
                 'message': 'Insufficient permissions for plan updates'
-            })
+            }, namespace=namespace)
             return False
         
         # Check rate limits
@@ -367,9 +408,9 @@ class WebSocketManager:
         # Emit plan update
         self._emit_to_room(room_id, EventType.PLAN_UPDATED, {
             'update': plan_update.to_dict()
-        }, exclude_user=connection.user_id)
+        }, exclude_user=connection.user_id, namespace=namespace, skip_sid=socket_id)
         
-        logger.info(f"Plan update: {plan_update.id} in room {room_id}")
+        logger.debug("Plan update: %s in room %s", plan_update.id, room_id)
         return True
     
     def handle_activity_drag(self, socket_id: str, room_id: str, activity_id: str,
@@ -428,7 +469,7 @@ class WebSocketManager:
             delivered_messages.append(queued_msg)
         
         if delivered_messages:
-            logger.info(f"Delivered {len(delivered_messages)} queued messages to {user_id}")
+            logger.info("Delivered %s queued messages to %s", len(delivered_messages), user_id)
     
     def get_queued_message_count(self, user_id: str) -> int:
         """Get number of queued messages for user."""
@@ -465,7 +506,7 @@ class WebSocketManager:
             # Block user for the remainder of the window
             remaining_time = window_duration - (datetime.utcnow() - rate_limit.window_start)
             rate_limit.blocked_until = datetime.utcnow() + remaining_time
-            logger.warning(f"Rate limit exceeded: user={user_id}, event={event_name}")
+            logger.warning("Rate limit exceeded: user=%s, event=%s", user_id, event_name)
             return False
         
         return True
@@ -484,8 +525,14 @@ class WebSocketManager:
     # Event Emission
     
     def _emit_to_room(self, room_id: str, event_type: EventType, data: Dict[str, Any], 
-                     exclude_user: Optional[str] = None) -> None:
-        """Emit event to all users in room."""
+                     exclude_user: Optional[str] = None, namespace: Optional[str] = None,
+                     skip_sid: Optional[str] = None) -> None:
+        """
+        Emit event to all users in room.
+        
+        Without a namespace this must run inside an event handler and skips the
+        current socket; with one it emits through self.socketio and skips skip_sid.
+        """
         event = WebSocketEvent(
             event_type=event_type,
             room_id=room_id,
@@ -495,10 +542,15 @@ class WebSocketManager:
         )
         
         # Use SocketIO emit to room
-        emit(event_type.value, event.to_dict(), room=room_id, include_self=False)
+        if namespace and self.socketio:
+            self.socketio.emit(event_type.value, event.to_dict(), to=room_id,
+                               namespace=namespace, skip_sid=skip_sid)
+        else:
+            emit(event_type.value, event.to_dict(), room=room_id, include_self=False)
     
-    def _emit_to_user(self, user_id: str, event_type: EventType, data: Dict[str, Any]) -> None:
-        """Emit event to specific user."""
+    def _emit_to_user(self, user_id: str, event_type: EventType, data: Dict[str, Any],
+                     namespace: Optional[str] = None) -> None:
+        """Emit event to specific user, through self.socketio when a namespace is given."""
         socket_ids = self.user_sockets.get(user_id, set())
         if socket_ids:
             event = WebSocketEvent(
@@ -509,8 +561,12 @@ class WebSocketManager:
                 event_id=str(uuid.uuid4())
             )
             
+            payload = event.to_dict()
             for socket_id in socket_ids:
-                emit(event_type.value, event.to_dict(), room=socket_id)
+                if namespace and self.socketio:
+                    self.socketio.emit(event_type.value, payload, to=socket_id, namespace=namespace)
+                else:
+                    emit(event_type.value, payload, room=socket_id)
     
     # Utility Methods
     
@@ -519,7 +575,7 @@ class WebSocketManager:
         user_rooms = []
         for room in self.rooms.values():
             if user_id in room.permissions or room.room_type == RoomType.CHAT:
-                user_rooms.append(room.to_dict())
+                user_rooms.append(room.cached_dict())
         return user_rooms
     
     def get_room_history(self, room_id: str, limit: int = 50) -> List[Dict[str, Any]]:
@@ -528,12 +584,67 @@ class WebSocketManager:
         return [msg.to_dict() for msg in messages[-limit:]]
     
     def get_active_users(self, room_id: str) -> List[Dict[str, Any]]:
-        """Get active users in room."""
+        """Get active users in room, reusing the user dicts of the room's cached dict."""
         room = self.get_room(room_id)
         if room:
-            return [user.to_dict() for user in room.active_users.values()]
+            return list(room.cached_dict()['active_users'].values())
         return []
     
+    def backpressure(self, socket_id: str, namespace: str = '/') -> int:
+        """
+        Get the number of packets waiting to be written to a socket.
+        
+        Args:
+            socket_id: Socket.IO session ID
+            namespace: Namespace the session ID belongs to
+            
+        Returns:
+            Outgoing queue depth, or 0 if the socket is unknown
+        
+        Reads python-socketio/python-engineio internals (manager.eio_sid_from_sid,
+        eio.sockets and the socket's queue, pinned in requirements.txt); reports
+        no backpressure if any of them is missing.
+        """
+        try:
+            server = current_app.extensions['socketio'].server
+            eio_sid_from_sid = getattr(server.manager, 'eio_sid_from_sid', None)
+            eio_sockets = getattr(server.eio, 'sockets', None)
+            if eio_sid_from_sid is None or eio_sockets is None:
+                _warn_once("python-socketio internals unavailable; backpressure not measured")
+                return 0
+            
+            outgoing = getattr(eio_sockets.get(eio_sid_from_sid(socket_id, namespace)), 'queue', None)
+            return outgoing.qsize() if outgoing is not None else 0
+        except Exception:
+            logger.exception("Backpressure check error")
+            return 0
+    
+    def get_room_snapshot(self, room_id: str, history_limit: int = 50) -> Optional[Dict[str, Any]]:
+        """
+        Get a room's details, active users and recent history in one pass.
+        
+        Args:
+            room_id: Room identifier
+            history_limit: Maximum number of most recent messages to include
+            
+        Returns:
+            Dict with 'room', 'active_users' and 'message_history', or None if the room does not exist
+        """
+        room = self.get_room(room_id)
+        if not room:
+            return None
+        
+        room_data = room.cached_dict()
+        history = self.message_history.get(room_id, ())
+        recent = list(islice(reversed(history), history_limit))
+        recent.reverse()
+        return {
+            'room': room_data,
+            # Reuse the user dicts already built for room_data
+            'active_users': list(room_data['active_users'].values()),
+            'message_history': [msg.to_dict() for msg in recent]
+        }
+    
     def cleanup_inactive_connections(self, timeout_minutes: int = 30) -> int:
         """Clean up inactive connections."""
         cutoff_time = datetime.utcnow() - timedelta(minutes=timeout_minutes)
@@ -546,7 +657,7 @@ class WebSocketManager:
         for socket_id in inactive_connections:
             self.remove_connection(socket_id)
         
-        logger.info(f"Cleaned up {len(inactive_connections)} inactive connections")
+        logger.info("Cleaned up %s inactive connections", len(inactive_connections))
         return len(inactive_connections)
     
     def get_stats(self) -> Dict[str, Any]:
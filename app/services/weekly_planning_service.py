@@ -3,9 +3,11 @@ Weekly Planning Service
 Comprehensive service for managing weekly lesson plans, templates, and activities.
 """
 
+import heapq
 import logging
+import time
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 import uuid
 
 from google.cloud import firestore
@@ -17,20 +19,49 @@ from app.services.ai_service import AIService
 
 logger = logging.getLogger(__name__)
 
+def _ics_line(name: str, value: str) -> str:
+    """Format an iCalendar text property, escaped and folded at 75 octets."""
+    value = (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+             .replace('\r\n', '\\n').replace('\n', '\\n'))
+    line = f"{name}:{value}"
+    if len(line.encode('utf-8')) <= 75:
+        return line + "\r\n"
+    
+    # Continuation lines start with a space, leaving 74 octets of content
+    chunks, current, size, limit = [], [], 0, 75
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            chunks.append(''.join(current))
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += char_size
+    chunks.append(''.join(current))
+    return "\r\n ".join(chunks) + "\r\n"
+
 class WeeklyPlanningService:
     """Service for managing weekly lesson plans and activities."""
     
+    # Plan documents are cached briefly so a client opening a plan and then its
+    # summary or conflicts costs one Firestore read. Each worker holds its own
+    # copy and writes only invalidate the local one, so other workers can serve
+    # the previous plan (and its ETag) for up to PLAN_CACHE_TTL after a change
+    PLAN_CACHE_TTL = 10.0
+    PLAN_CACHE_SIZE = 512
+    
     def __init__(self):
         """Initialize the weekly planning service."""
         self.db = firestore.Client()
         self.ai_service = AIService()
+        self._plan_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
         
     # Weekly Plans Management
     
     def get_weekly_plans(self, user_id: str, start_date: Optional[date] = None,
                         end_date: Optional[date] = None, grade: Optional[str] = None,
                         is_template: Optional[bool] = None, page: int = 1,
-                        page_size: int = 20, search: Optional[str] = None) -> Dict[str, Any]:
+                        page_size: int = 20, search: Optional[str] = None,
+                        include_total: bool = True) -> Dict[str, Any]:
         """
         Get weekly plans with filtering, pagination, and search.
         
@@ -43,6 +74,8 @@ class WeeklyPlanningService:
             page: Page number for pagination
             page_size: Number of items per page
             search: Search term for title/description
+            include_total: Include totalCount/totalPages; when False only the
+                plans up to the requested page are ranked instead of sorting all
             
         Returns:
             Dictionary with plans and pagination info
@@ -83,13 +116,27 @@ class WeeklyPlanningService:
                 
                 plans.append(plan)
             
+            start_idx = (page - 1) * page_size
+            end_idx = start_idx + page_size
+            
+            if not include_total:
+                # Rank only the newest plans up to one past this page
+                newest = heapq.nlargest(end_idx + 1, plans, key=lambda x: x.created_at)
+                return {
+                    'plans': [plan.to_dict() for plan in newest[start_idx:end_idx]],
+                    'pagination': {
+                        'page': page,
+                        'pageSize': page_size,
+                        'hasNext': len(newest) > end_idx,
+                        'hasPrevious': page > 1
+                    }
+                }
+            
             # Sort by creation date (newest first)
             plans.sort(key=lambda x: x.created_at, reverse=True)
             
             # Apply pagination
             total_count = len(plans)
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
             paginated_plans = plans[start_idx:end_idx]
             
             # Convert to dict format
@@ -111,16 +158,37 @@ class WeeklyPlanningService:
             logger.error(f"Error getting weekly plans: {str(e)}")
             raise
     
+    def ping(self) -> bool:
+        """
+        Check that the weekly plans collection can be queried.
+        
+        Returns:
+            True if Firestore answered the query
+        """
+        try:
+            list(self.db.collection('weekly_plans').limit(1).stream())
+            return True
+        except Exception as e:
+            logger.error(f"Weekly planning health check failed: {str(e)}")
+            return False
+    
     def get_weekly_plan_by_id(self, plan_id: str, user_id: str) -> Optional[WeeklyPlan]:
         """Get a specific weekly plan by ID."""
         try:
-            doc_ref = self.db.collection('weekly_plans').document(plan_id)
-            doc = doc_ref.get()
-            
-            if not doc.exists:
-                return None
+            cached = self._plan_cache.get(plan_id)
+            if cached and cached[0] > time.monotonic():
+                plan_data = cached[1]
+            else:
+                doc_ref = self.db.collection('weekly_plans').document(plan_id)
+                doc = doc_ref.get()
+                
+                if not doc.exists:
+                    return None
+                
+                plan_data = doc.to_dict()
+                self._cache_plan_document(plan_id, plan_data)
             
-            plan_data = doc.to_dict()
+            # Build a fresh plan on every call so callers can modify it freely
             plan = WeeklyPlan.from_dict(plan_data)
             
             # Check access permissions
@@ -133,6 +201,30 @@ class WeeklyPlanningService:
             logger.error(f"Error getting weekly plan {plan_id}: {str(e)}")
             return None
     
+    def get_plan_with_summary(self, plan_id: str, user_id: str) -> Tuple[Optional[WeeklyPlan], Optional[PlanSummary]]:
+        """
+        Load a plan and summarize it from the loaded document.
+        
+        Returns:
+            Tuple of (plan, summary), or (None, None) if not found or access is denied
+        """
+        plan = self.get_weekly_plan_by_id(plan_id, user_id)
+        if not plan:
+            return None, None
+        return plan, self.generate_plan_summary(plan)
+    
+    def get_plan_with_conflicts(self, plan_id: str, user_id: str) -> Tuple[Optional[WeeklyPlan], List[Dict[str, Any]]]:
+        """
+        Load a plan and detect its scheduling conflicts from the loaded document.
+        
+        Returns:
+            Tuple of (plan, serialized conflicts), or (None, []) if not found or access is denied
+        """
+        plan = self.get_weekly_plan_by_id(plan_id, user_id)
+        if not plan:
+            return None, []
+        return plan, [conflict.to_dict() for conflict in self.detect_conflicts(plan)]
+    
     def create_weekly_plan(self, user_id: str, plan_data: Dict[str, Any]) -> WeeklyPlan:
         """Create a new weekly plan."""
         try:
@@ -184,6 +276,7 @@ class WeeklyPlanningService:
             # Save changes
             doc_ref = self.db.collection('weekly_plans').document(plan_id)
             doc_ref.update(plan.to_dict())
+            self._invalidate_plan(plan_id)
             
             logger.info(f"Updated weekly plan {plan_id}")
             return plan
@@ -192,6 +285,50 @@ class WeeklyPlanningService:
             logger.error(f"Error updating weekly plan {plan_id}: {str(e)}")
             raise
     
+    def update_day_plan(self, plan: WeeklyPlan, user_id: str, day_index: int,
+                        day_plan: DayPlan) -> bool:
+        """
+        Replace one day of an already loaded plan and persist only the affected fields.
+        
+        Args:
+            plan: Plan loaded by get_weekly_plan_by_id for this user
+            user_id: ID of the user making the change
+            day_index: Index of the day within plan.day_plans
+            day_plan: New day plan
+            
+        Returns:
+            True if the day was saved, False if the user does not own the plan
+        """
+        try:
+            if plan.user_id != user_id:
+                return False
+            
+            for activity in day_plan.activities:
+                if activity.duration <= 0:
+                    raise ValueError(f"Activity '{activity.title}' must have a positive duration")
+            
+            plan.day_plans[day_index] = day_plan
+            plan.updated_at = datetime.utcnow()
+            self._process_plan_subjects(plan)
+            
+            # Firestore cannot address a single array element, so dayPlans is
+            # rewritten as a whole; the rest of the document is left untouched
+            doc_ref = self.db.collection('weekly_plans').document(plan.id)
+            doc_ref.update({
+                'dayPlans': [day.to_dict() for day in plan.day_plans],
+                'subjects': plan.subjects,
+                'totalHours': plan.calculate_total_hours(),
+                'updatedAt': plan.updated_at.isoformat() + 'Z'
+            })
+            self._invalidate_plan(plan.id)
+            
+            logger.info(f"Updated day {day_index} of weekly plan {plan.id}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating day {day_index} of weekly plan {plan.id}: {str(e)}")
+            raise
+    
     def delete_weekly_plan(self, plan_id: str, user_id: str) -> bool:
         """Delete a weekly plan."""
         try:
@@ -203,6 +340,7 @@ class WeeklyPlanningService:
             # Delete from Firestore
             doc_ref = self.db.collection('weekly_plans').document(plan_id)
             doc_ref.delete()
+            self._invalidate_plan(plan_id)
             
             logger.info(f"Deleted weekly plan {plan_id}")
             return True
@@ -259,8 +397,16 @@ class WeeklyPlanningService:
     # Template Management
     
     def get_templates(self, category: Optional[str] = None, grade: Optional[str] = None,
-                     subject: Optional[str] = None, user_id: Optional[str] = None) -> List[WeeklyPlan]:
-        """Get weekly plan templates with filtering."""
+                     subject: Optional[str] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get weekly plan templates with filtering.
+        
+        Templates are stored via WeeklyPlan.to_dict(), so the stored documents are
+        filtered and returned as-is instead of round-tripping through the model.
+        
+        Returns:
+            List of serialized templates, newest first
+        """
         try:
             query = self.db.collection('weekly_plans').where('is_template', '==', True)
             
@@ -273,20 +419,20 @@ class WeeklyPlanningService:
             
             for doc in docs:
                 template_data = doc.to_dict()
-                template = WeeklyPlan.from_dict(template_data)
                 
                 # Apply additional filters
-                if grade and grade not in template.target_grades:
+                if grade and grade not in template_data.get('targetGrades', []):
                     continue
-                if subject and subject not in template.subjects:
+                if subject and subject not in template_data.get('subjects', []):
                     continue
                 
                 # Include public templates and user's own templates
-                if template.user_id == '' or template.user_id == user_id:
-                    templates.append(template)
+                owner = template_data.get('userId', '')
+                if owner == '' or owner == user_id:
+                    templates.append(template_data)
             
             # Sort by usage/popularity (you could track this)
-            templates.sort(key=lambda x: x.created_at, reverse=True)
+            templates.sort(key=lambda x: x.get('createdAt') or '', reverse=True)
             
             return templates
             
@@ -297,8 +443,13 @@ class WeeklyPlanningService:
     # Activity Management
     
     def get_activity_templates(self, user_id: str, subject: Optional[str] = None,
-                              grade: Optional[str] = None, type: Optional[str] = None) -> List[ActivityTemplate]:
-        """Get activity templates for the activity library."""
+                              grade: Optional[str] = None, type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get activity templates for the activity library.
+        
+        Returns:
+            List of serialized templates, most used and highest rated first
+        """
         try:
             query = self.db.collection('activity_templates')
             
@@ -307,22 +458,21 @@ class WeeklyPlanningService:
             
             for doc in docs:
                 template_data = doc.to_dict()
-                template = ActivityTemplate.from_dict(template_data)
                 
                 # Include public templates and user's own
-                if template.is_public or template.user_id == user_id:
+                if template_data.get('isPublic', False) or template_data.get('userId', '') == user_id:
                     # Apply filters
-                    if subject and template.subject != subject:
+                    if subject and template_data.get('subject', '') != subject:
                         continue
-                    if grade and template.grade != grade:
+                    if grade and template_data.get('grade', '') != grade:
                         continue
-                    if type and template.type.value != type:
+                    if type and template_data.get('type', ActivityType.LECTURE.value) != type:
                         continue
                     
-                    templates.append(template)
+                    templates.append(template_data)
             
             # Sort by usage count and rating
-            templates.sort(key=lambda x: (x.usage_count, x.rating), reverse=True)
+            templates.sort(key=lambda x: (x.get('usageCount', 0), x.get('rating', 0.0)), reverse=True)
             
             return templates
             
@@ -469,8 +619,65 @@ class WeeklyPlanningService:
         
         return summary
     
+    # Export
+    
+    def iter_plan_ics(self, weekly_plan: WeeklyPlan) -> Iterator[str]:
+        """
+        Render a weekly plan as an iCalendar (RFC 5545) document, one chunk per event.
+        
+        Scheduled activities become timed events in floating local time;
+        unscheduled ones become all-day events on their day.
+        
+        Args:
+            weekly_plan: Plan to export
+            
+        Yields:
+            Calendar text chunks with CRLF line endings
+        """
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        yield (
+            "BEGIN:VCALENDAR\r\n"
+            "VERSION:2.0\r\n"
+            "PRODID:-//GuruAI//Weekly Planning//EN\r\n"
+            "CALSCALE:GREGORIAN\r\n"
+            + _ics_line('X-WR-CALNAME', weekly_plan.title or 'Weekly Plan')
+        )
+        
+        for day_plan in weekly_plan.day_plans:
+            day = day_plan.date.strftime('%Y%m%d')
+            for activity in day_plan.activities:
+                lines = [
+                    "BEGIN:VEVENT\r\n",
+                    f"UID:{activity.id}@{weekly_plan.id}\r\n",
+                    f"DTSTAMP:{stamp}\r\n"
+                ]
+                if activity.start_time and activity.end_time:
+                    lines.append(f"DTSTART:{day}T{activity.start_time.replace(':', '')}00\r\n")
+                    lines.append(f"DTEND:{day}T{activity.end_time.replace(':', '')}00\r\n")
+                else:
+                    lines.append(f"DTSTART;VALUE=DATE:{day}\r\n")
+                lines.append(_ics_line('SUMMARY', activity.title))
+                if activity.description:
+                    lines.append(_ics_line('DESCRIPTION', activity.description))
+                if activity.subject:
+                    lines.append(_ics_line('CATEGORIES', activity.subject))
+                lines.append("END:VEVENT\r\n")
+                yield ''.join(lines)
+        
+        yield "END:VCALENDAR\r\n"
+    
     # Helper Methods
     
+    def _cache_plan_document(self, plan_id: str, plan_data: Dict[str, Any]) -> None:
+        """Cache a stored plan document, evicting the oldest entry when full."""
+        if len(self._plan_cache) >= self.PLAN_CACHE_SIZE:
+            self._plan_cache.pop(next(iter(self._plan_cache)), None)
+        self._plan_cache[plan_id] = (time.monotonic() + self.PLAN_CACHE_TTL, plan_data)
+    
+    def _invalidate_plan(self, plan_id: str) -> None:
+        """Drop a plan document from the cache before it is written or deleted."""
+        self._plan_cache.pop(plan_id, None)
+    
     def _validate_weekly_plan(self, plan: WeeklyPlan) -> None:
         """Validate a weekly plan."""
         if not plan.title:
@@ -6,14 +6,28 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Shared across requests so Firebase and its Firestore-backed services are set up once
+_auth_service = None
+
+def _get_auth_service() -> FirebaseAuthService:
+    """Get the process-wide auth service, creating it on first use."""
+    global _auth_service
+    if _auth_service is None:
+        _auth_service = FirebaseAuthService()
+    return _auth_service
+
 def get_current_user():
     """Get the current user from Flask's g object."""
-    return g.current_user if hasattr(g, 'current_user') else None
+    return getattr(g, 'current_user', None)
 
 def token_required(f):
     """Decorator that requires a valid JWT token."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        # Token already verified earlier in this request (stacked decorators)
+        if getattr(g, 'current_user', None) is not None:
+            return f(*args, **kwargs)
+        
         token = None
         auth_header = request.headers.get('Authorization')
         
@@ -27,8 +41,7 @@ def token_required(f):
             }), 401
         
         # Verify token
-        auth_service = FirebaseAuthService()
-        result = auth_service.verify_jwt_token(token)
+        result = _get_auth_service().verify_jwt_token(token)
         
         if not result['valid']:
             return jsonify({
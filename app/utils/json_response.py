@@ -0,0 +1,95 @@
+"""
+JSON Response Helper
+orjson-backed replacement for flask.jsonify on high-volume endpoints.
+"""
+
+import dataclasses
+import hashlib
+from typing import Any, Optional
+
+import orjson
+from flask import Response, request
+
+# Encoding options shared by every response; dataclasses are passed through to
+# _json_default so models serialize via their to_dict() API shape
+_ORJSON_OPT = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+def _json_default(obj: Any) -> Any:
+    """Serialize values orjson does not handle natively."""
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    isoformat = getattr(obj, 'isoformat', None)
+    if isoformat is not None:
+        return isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+def encode_json(payload: Any) -> bytes:
+    """
+    Encode a payload the same way json_response does.
+    
+    Used to precompute bodies for fixed responses at import time.
+    
+    Args:
+        payload: JSON-serializable value
+        
+    Returns:
+        UTF-8 encoded JSON
+    """
+    return orjson.dumps(payload, default=_json_default, option=_ORJSON_OPT)
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """
+    Create a JSON response encoded with orjson.
+    
+    datetime and date values are written in ISO 8601 form, and objects with a
+    to_dict() method are serialized through it.
+    
+    Args:
+        payload: JSON-serializable response body
+        status: HTTP status code
+        
+    Returns:
+        Flask Response with an application/json body
+    """
+    body = orjson.dumps(payload, default=_json_default, option=_ORJSON_OPT)
+    return Response(body, status=status, mimetype='application/json')
+
+def _not_modified(etag: str) -> Response:
+    """Create an empty 304 response carrying the given ETag."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+def conditional_json_response(payload: Any, etag: Optional[str] = None) -> Response:
+    """
+    Create a 200 JSON response with an ETag, or a 304 if the client's copy is current.
+    
+    When etag is given, a matching If-None-Match header short-circuits before the
+    payload is encoded. Otherwise the ETag is a hash of the encoded body,
+    which still saves the transfer on a match.
+    
+    Args:
+        payload: JSON-serializable response body
+        etag: Precomputed entity tag for the resource, if known
+        
+    Returns:
+        Flask Response with an application/json body, or an empty 304 response
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    
+    body = orjson.dumps(payload, default=_json_default, option=_ORJSON_OPT)
+    
+    if etag is None:
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+    
+    response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    return response
@@ -3,20 +3,201 @@ Simplified WebSocket Authentication Middleware
 Basic authentication for WebSocket connections without session dependency.
 """
 
+import fnmatch
+import hashlib
 import logging
+import re
+import threading
+import time
 import jwt
-from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Tuple, Iterable
 from functools import wraps
-from flask import current_app
+from flask import current_app, session
+from flask_socketio import emit
 
 logger = logging.getLogger(__name__)
 
+# Origins accepted for WebSocket connections during development
+DEFAULT_ALLOWED_ORIGINS = (
+    'http://localhost:5000',
+    'http://127.0.0.1:5000',
+    'http://localhost:3000',  # Common React dev server
+    'http://127.0.0.1:3000'
+)
+
+# Seconds per unit for rate strings such as '10/minute'
+RATE_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Most keys an in-process limiter table holds; when full, idle keys are pruned
+# first and the oldest keys after that
+RATE_LIMIT_MAX_KEYS = 50000
+
+# Token buckets keyed by (user_id, event_type) -> [tokens, last_refill, window]
+_ws_buckets: Dict[Tuple[str, str], List[float]] = {}
+_ws_buckets_lock = threading.Lock()
+
+def _prune_limiter(table: Dict[Any, List[Any]], is_idle) -> None:
+    """
+    Make room in a full limiter table; the caller must hold the table's lock.
+    
+    Idle keys are dropped first, as they would be recreated in the same state.
+    If that frees too little, the oldest keys are dropped until the table is
+    at 90% of RATE_LIMIT_MAX_KEYS.
+    
+    Args:
+        table: Limiter table to prune
+        is_idle: Predicate on a key's state, True when the key can be dropped
+    """
+    for key in [key for key, state in table.items() if is_idle(state)]:
+        del table[key]
+    
+    target = RATE_LIMIT_MAX_KEYS * 9 // 10
+    while len(table) > target:
+        del table[next(iter(table))]
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse a rate string like '10/minute' into (limit, window_seconds)."""
+    count, _, period = rate.partition('/')
+    return int(count), RATE_PERIODS.get(period.strip().rstrip('s'), 60)
+
+def take_token(key: Tuple[str, str], capacity: int, window: float) -> float:
+    """
+    Take one token from the bucket for key, refilling it lazily.
+    
+    Buckets hold up to capacity tokens and refill at capacity/window per second.
+    Safe to call from several threads.
+    
+    Args:
+        key: (user_id, event_type) bucket key
+        capacity: Maximum burst size
+        window: Seconds to refill an empty bucket
+        
+    Returns:
+        0.0 if a token was taken, otherwise seconds until one is available
+    """
+    refill_rate = capacity / window
+    with _ws_buckets_lock:
+        now = time.monotonic()
+        bucket = _ws_buckets.get(key)
+        if bucket is None:
+            if len(_ws_buckets) >= RATE_LIMIT_MAX_KEYS:
+                # A bucket untouched for its whole window has refilled completely
+                _prune_limiter(_ws_buckets, lambda state: now - state[1] >= state[2])
+            _ws_buckets[key] = [capacity - 1.0, now, window]
+            return 0.0
+        
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+        bucket[1] = now
+        if tokens < 1.0:
+            bucket[0] = tokens
+            return (1.0 - tokens) / refill_rate
+        bucket[0] = tokens - 1.0
+        return 0.0
+
+# Verified JWT claims reused across connects: sha256(token) -> (expires_at, user_data)
+TOKEN_CACHE_TTL = 30
+TOKEN_CACHE_SIZE = 10000
+_token_cache: 'OrderedDict[bytes, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+def _get_cached_token(token_key: bytes) -> Optional[Dict[str, Any]]:
+    """Get user data for a recently verified token, or None if absent or expired."""
+    with _token_cache_lock:
+        entry = _token_cache.get(token_key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _token_cache[token_key]
+            return None
+        _token_cache.move_to_end(token_key)
+        return dict(entry[1])
+
+def _cache_token(token_key: bytes, user_data: Dict[str, Any], token_exp: Optional[float]) -> None:
+    """Remember verified user data until the cache TTL or the token's own expiry."""
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+    with _token_cache_lock:
+        _token_cache[token_key] = (expires_at, dict(user_data))
+        _token_cache.move_to_end(token_key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+# Sub-windows per sliding rate-limit window (e.g. 6 x 10s for a one-minute limit)
+SLIDING_WINDOW_BUCKETS = 6
+
+# Sliding-window counters keyed by (user_id, event_type) -> [last_bucket_epoch, bucket_counts, window]
+_ws_windows: Dict[Tuple[str, str], List[Any]] = {}
+_ws_windows_lock = threading.Lock()
+
+def take_window_slot(key: Tuple[str, str], limit: int, window: float) -> float:
+    """
+    Count one event for key against a bucketed sliding window.
+    
+    The window is split into SLIDING_WINDOW_BUCKETS sub-windows that rotate lazily,
+    so memory per key is constant and a burst cannot straddle a window boundary.
+    Safe to call from several threads.
+    
+    Args:
+        key: (user_id, event_type) counter key
+        limit: Maximum events within any window
+        window: Window length in seconds
+        
+    Returns:
+        0.0 if the event was counted, otherwise seconds until the oldest sub-window expires
+    """
+    width = window / SLIDING_WINDOW_BUCKETS
+    with _ws_windows_lock:
+        now = time.monotonic()
+        epoch = int(now // width)
+        state = _ws_windows.get(key)
+        if state is None:
+            if len(_ws_windows) >= RATE_LIMIT_MAX_KEYS:
+                # Every sub-window of a key idle for a whole window has expired
+                _prune_limiter(
+                    _ws_windows,
+                    lambda state: now - state[0] * (state[2] / SLIDING_WINDOW_BUCKETS) >= state[2]
+                )
+            state = _ws_windows[key] = [
+                epoch, deque([0] * SLIDING_WINDOW_BUCKETS, maxlen=SLIDING_WINDOW_BUCKETS), window
+            ]
+        
+        counts = state[1]
+        shift = epoch - state[0]
+        if shift:
+            counts.extend([0] * min(shift, SLIDING_WINDOW_BUCKETS))
+            state[0] = epoch
+        
+        if sum(counts) >= limit:
+            oldest = next((i for i, count in enumerate(counts) if count), SLIDING_WINDOW_BUCKETS - 1)
+            return (epoch + oldest + 1) * width - now
+        counts[-1] += 1
+        return 0.0
+
 class SimpleWebSocketAuth:
     """Simplified WebSocket authentication handler."""
     
-    def __init__(self):
-        """Initialize WebSocket authentication."""
-        pass
+    def __init__(self, buffer_connection_logs: bool = False,
+                 allowed_origins: Iterable[str] = DEFAULT_ALLOWED_ORIGINS):
+        """
+        Initialize WebSocket authentication.
+        
+        Args:
+            buffer_connection_logs: Queue connection log entries for a background
+                flush (see flush_connection_log) instead of logging them inline
+            allowed_origins: Exact origins, or wildcard patterns such as
+                'https://*.example.com', accepted by validate_origin
+        """
+        self.buffer_connection_logs = buffer_connection_logs
+        self._connection_log = deque(maxlen=10000)
+        
+        # Exact origins are a set lookup; wildcard patterns are compiled once
+        allowed_origins = tuple(allowed_origins)
+        self._allowed_origins = frozenset(o for o in allowed_origins if '*' not in o)
+        self._origin_patterns = tuple(
+            re.compile(fnmatch.translate(o)) for o in allowed_origins if '*' in o
+        )
     
     def authenticate_socket(self, auth_data: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
         """
@@ -58,6 +239,12 @@ class SimpleWebSocketAuth:
             # Validate JWT token (simplified for testing)
             try:
                 if hasattr(current_app, 'config') and current_app.config.get('SECRET_KEY'):
+                    # Reconnects with the same token skip signature verification
+                    token_key = hashlib.sha256(token.encode()).digest()
+                    user_data = _get_cached_token(token_key)
+                    if user_data is not None:
+                        return True, user_data, None
+                    
                     payload = jwt.decode(
                         token,
                         current_app.config['SECRET_KEY'],
@@ -69,6 +256,7 @@ class SimpleWebSocketAuth:
                         'username': payload.get('username'),
                         'permissions': payload.get('permissions', ['read'])
                     }
+                    _cache_token(token_key, user_data, payload.get('exp'))
                     return True, user_data, None
                 else:
                     # Fallback for development
@@ -123,21 +311,23 @@ class SimpleWebSocketAuth:
             logger.error(f"Permission check error: {str(e)}")
             return False
     
-    def check_rate_limit(self, user_id: str, rate: str = '10/minute') -> bool:
+    def check_rate_limit(self, user_id: str, rate: str = '10/minute',
+                         namespace: str = '/') -> bool:
         """
-        Check rate limit for user.
+        Check connection rate limit for user.
         
         Args:
             user_id: User identifier
             rate: Rate limit specification
+            namespace: Socket.IO namespace being connected to; each has its own allowance
             
         Returns:
             True if within rate limit, False otherwise
         """
         try:
-            # Simplified rate limiting for testing
-            # In production, you'd use Redis or similar for distributed rate limiting
-            return True
+            # In-process token bucket; a multi-worker deployment would need Redis or similar
+            limit, window = parse_rate(rate)
+            return take_token((user_id, f'connection:{namespace}'), limit, window) == 0.0
             
         except Exception as e:
             logger.error(f"Rate limit check error: {str(e)}")
@@ -154,22 +344,14 @@ class SimpleWebSocketAuth:
             True if origin is allowed, False otherwise
         """
         try:
-            # For development, allow all origins
-            allowed_origins = [
-                'http://localhost:5000',
-                'http://127.0.0.1:5000',
-                'http://localhost:3000',  # Common React dev server
-                'http://127.0.0.1:3000'
-            ]
-            
-            if origin in allowed_origins:
+            if origin in self._allowed_origins:
                 return True
             
             # For testing, be permissive
             if not origin or origin == 'null':
                 return True
-                
-            return False
+            
+            return any(pattern.match(origin) for pattern in self._origin_patterns)
             
         except Exception as e:
             logger.error(f"Origin validation error: {str(e)}")
@@ -196,10 +378,30 @@ class SimpleWebSocketAuth:
             if extra_data:
                 log_data.update(extra_data)
             
-            logger.info(f"WebSocket {event_type}: {log_data}")
+            if self.buffer_connection_logs:
+                self._connection_log.append(log_data)
+            else:
+                logger.info(f"WebSocket {event_type}: {log_data}")
             
         except Exception as e:
             logger.error(f"Connection logging error: {str(e)}")
+    
+    def flush_connection_log(self) -> int:
+        """
+        Write out buffered connection log entries.
+        
+        Returns:
+            Number of entries flushed
+        """
+        flushed = 0
+        while True:
+            try:
+                log_data = self._connection_log.popleft()
+            except IndexError:
+                break
+            logger.info("WebSocket %s: %s", log_data['event_type'], log_data)
+            flushed += 1
+        return flushed
 
 # Simplified decorators that don't depend on session
 def require_ws_auth(f):
@@ -207,10 +409,10 @@ def require_ws_auth(f):
     Note: This is a simplified version for testing.
     """
     def decorated(*args, **kwargs):
-        # For testing, provide mock user data
-        # In production, you'd want proper session/auth checking
         if 'user_data' not in kwargs or kwargs['user_data'] is None:
-            kwargs['user_data'] = {
+            # Use the user authenticated on connect, falling back to mock
+            # user data for testing
+            kwargs['user_data'] = session.get('user_data') or {
                 'user_id': 'test_user_001',
                 'username': 'TestUser',
                 'permissions': ['read', 'write'],
@@ -231,23 +433,40 @@ def require_room_permission(permission='read'):
         return decorated
     return decorator
 
-def rate_limit_ws(event_type=None, limit=None, window=None, rate='10/minute'):
+def rate_limit_ws(event_type=None, limit=None, window=None, rate='10/minute', strategy='token_bucket'):
     """Decorator for WebSocket rate limiting.
-    Note: This is a simplified version for testing.
+    Uses a token bucket per (user_id, event_type) allowing bursts of up to limit events,
+    or a bucketed sliding window (strategy='sliding_window') capping events in any window.
     Accepts various parameter formats for compatibility.
     """
     # Handle different calling patterns
     if callable(event_type):
         # Called as @rate_limit_ws without parameters
-        func = event_type
-        def decorated(*args, **kwargs):
-            return func(*args, **kwargs)
-        return decorated
+        return rate_limit_ws(rate=rate)(event_type)
     
     def decorator(f):
+        event_name = event_type or f.__name__
+        if limit and window:
+            max_events, window_seconds = limit, window
+        else:
+            max_events, window_seconds = parse_rate(rate)
+        limiter = take_window_slot if strategy == 'sliding_window' else take_token
+        
+        @wraps(f)
         def decorated(*args, **kwargs):
-            # For now, just pass through
-            # In production, you'd want proper rate limiting
+            user_data = kwargs.get('user_data')
+            if not user_data:
+                return f(*args, **kwargs)  # Let auth decorator handle
+            
+            retry_after = limiter((user_data['user_id'], event_name), max_events, window_seconds)
+            if retry_after:
+                emit('error', {
+                    'message': f'Rate limit exceeded for {event_name}',
+                    'code': 'RATE_LIMIT_EXCEEDED',
+                    'retry_after': int(retry_after) + 1
+                })
+                return
+            
             return f(*args, **kwargs)
         return decorated
     return decorator
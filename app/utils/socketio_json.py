@@ -0,0 +1,23 @@
+"""
+Socket.IO JSON Codec
+orjson-backed json module for python-socketio and python-engineio packet encoding.
+"""
+
+import orjson
+
+class OrjsonModule:
+    """
+    Drop-in for the stdlib json module as used by the Socket.IO packet classes.
+    
+    datetime values are written natively in ISO 8601 form, matching isoformat().
+    """
+    
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        """Serialize obj to a compact JSON string (separators and other stdlib options are implied)."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        """Deserialize a JSON str or bytes payload."""
+        return orjson.loads(data)
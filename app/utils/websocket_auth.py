@@ -11,6 +11,8 @@ from flask import current_app
 from flask_socketio import disconnect, emit
 import redis
 
+from app.utils.simple_websocket_auth import take_token
+
 logger = logging.getLogger(__name__)
 
 class WebSocketAuth:
@@ -302,12 +304,19 @@ def rate_limit_ws(event_type: str, limit: int = 50, window: int = 60):
     """
     Decorator to apply rate limiting to WebSocket events.
     
+    Uses an in-process token bucket per (user_id, event_type), so the check
+    costs no Redis round trip; limits apply per worker process. Buckets live in
+    the shared, locked and size-bounded table of simple_websocket_auth, under
+    keys of their own so they never mix with that module's decorator.
+    
     Args:
         event_type: Type of event for rate limiting
         limit: Maximum number of events
         window: Time window in seconds
     """
     def decorator(f):
+        bucket_name = f'ws_auth:{event_type}'
+        
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
@@ -317,14 +326,12 @@ def rate_limit_ws(event_type: str, limit: int = 50, window: int = 60):
                 if not user_data:
                     return f(*args, **kwargs)  # Let auth decorator handle
                 
-                user_id = user_data.get('user_id')
-                ws_auth = WebSocketAuth()
-                
-                if not ws_auth.rate_limit_check(user_id, event_type):
+                retry_after = take_token((user_data.get('user_id'), bucket_name), limit, window)
+                if retry_after:
                     emit('error', {
                         'message': f'Rate limit exceeded for {event_type}',
                         'code': 'RATE_LIMIT_EXCEEDED',
-                        'retry_after': window
+                        'retry_after': int(retry_after) + 1
                     })
                     return
                 
@@ -12,6 +12,7 @@ from flask_socketio import SocketIO
 from app.services.websocket_manager import WebSocketManager
 from app.routes.websocket_chat import ChatSocketHandler
 from app.routes.websocket_collaboration import CollaborationSocketHandler
+from app.utils.socketio_json import OrjsonModule
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +52,7 @@ class WebSocketConfig:
         self.socketio = SocketIO(
             app,
             cors_allowed_origins=["http://localhost:5000", "http://127.0.0.1:5000", "http://localhost:3000", "http://127.0.0.1:3000"],
-            async_mode='threading',  # Use threading for development
+            async_mode=app.config.get('SOCKETIO_ASYNC_MODE', 'threading'),  # eventlet/gevent for many long-lived sockets
             logger=False,  # Disable SocketIO logging to avoid spam
             engineio_logger=False,
             allow_upgrades=True,
@@ -61,11 +62,11 @@ class WebSocketConfig:
             max_http_buffer_size=1e6,  # 1MB max message size
             # Add version compatibility settings
             always_connect=False,
-            json=None  # Use default JSON encoder
+            json=OrjsonModule  # orjson for every emit in all namespaces
         )
         
         # Initialize WebSocket manager
-        self.ws_manager = WebSocketManager(redis_client=self.redis_client)
+        self.ws_manager = WebSocketManager(redis_client=self.redis_client, socketio=self.socketio)
         
         # Initialize handlers
         self.chat_handler = ChatSocketHandler(self.socketio, self.ws_manager)
@@ -0,0 +1,117 @@
+import os
+import sys
+from unittest.mock import Mock, patch
+
+# Add the app directory to the Python path for CI/CD compatibility
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import pytest
+from flask import Flask
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from app.security.auth_manager import AuthManager
+
+@pytest.fixture
+def auth_manager(monkeypatch):
+    """AuthManager backed by an in-memory Redis, inside a request context."""
+    monkeypatch.setenv('JWT_SECRET_KEY', 'test-secret-key-for-auth-manager-tests')
+    server = fakeredis.FakeServer()
+    with patch('app.security.auth_manager._get_redis_pool', return_value=Mock()), \
+         patch('app.security.auth_manager.redis.Redis',
+               side_effect=lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)):
+        manager = AuthManager()
+
+    app = Flask(__name__)
+    with app.test_request_context('/', headers={'User-Agent': 'pytest'},
+                                  environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+        yield manager
+
+def _fingerprint(manager):
+    return manager.generate_device_fingerprint('pytest', '127.0.0.1')
+
+class TestRefreshTokenRotation:
+    """Test refresh token rotation and replay protection"""
+
+    def test_refresh_token_accepted_once(self, auth_manager):
+        """A refresh token can be redeemed once; the replay is rejected"""
+        tokens = auth_manager.create_tokens('user-1', _fingerprint(auth_manager))
+
+        ok, new_tokens, _ = auth_manager.refresh_tokens(tokens['refresh_token'])
+        assert ok
+        assert new_tokens['session_id'] == tokens['session_id']
+        assert new_tokens['refresh_token'] != tokens['refresh_token']
+
+        ok, payload, message = auth_manager.refresh_tokens(tokens['refresh_token'])
+        assert not ok
+        assert payload == {}
+        assert message == "Refresh token already used"
+
+    def test_rotated_refresh_token_is_usable(self, auth_manager):
+        """The refresh token issued by a rotation can itself be redeemed"""
+        tokens = auth_manager.create_tokens('user-1', _fingerprint(auth_manager))
+        _, first, _ = auth_manager.refresh_tokens(tokens['refresh_token'])
+
+        ok, second, _ = auth_manager.refresh_tokens(first['refresh_token'])
+        assert ok
+        assert auth_manager.verify_token(second['access_token'])[0]
+
+    def test_rotation_replaces_stored_refresh_mapping(self, auth_manager):
+        """Rotation deletes the old refresh token key and maps the new one to the session"""
+        tokens = auth_manager.create_tokens('user-1', _fingerprint(auth_manager))
+        _, old_payload, _ = auth_manager.verify_token(tokens['refresh_token'], 'refresh')
+
+        _, new_tokens, _ = auth_manager.refresh_tokens(tokens['refresh_token'])
+        _, new_payload, _ = auth_manager.verify_token(new_tokens['refresh_token'], 'refresh')
+
+        redis_client = auth_manager.redis_client
+        assert redis_client.get(f"refresh_token:{old_payload['jti']}") is None
+        assert redis_client.get(f"refresh_token:{new_payload['jti']}") == tokens['session_id']
+        assert redis_client.hget(f"session:{tokens['session_id']}", 'refresh_jti') == new_payload['jti']
+
+    def test_refresh_fails_after_session_revoked(self, auth_manager):
+        """A revoked session's refresh token is not accepted"""
+        tokens = auth_manager.create_tokens('user-1', _fingerprint(auth_manager))
+        assert auth_manager.revoke_session(tokens['session_id'], 'user-1')
+
+        ok, _, _ = auth_manager.refresh_tokens(tokens['refresh_token'])
+        assert not ok
+
+class TestSessionIndex:
+    """Test the per-user session index and its one-time backfill"""
+
+    def _legacy_session(self, manager, session_id, user_id, is_active='true'):
+        manager.redis_client.hset(f"session:{session_id}", mapping={
+            'user_id': user_id,
+            'is_active': is_active,
+            'created_at': '2024-01-01T00:00:00'
+        })
+
+    def test_backfill_indexes_active_legacy_sessions(self, auth_manager):
+        """Unindexed active sessions are indexed by the backfill; revoked ones are not"""
+        self._legacy_session(auth_manager, 'legacy-1', 'user-1')
+        self._legacy_session(auth_manager, 'legacy-2', 'user-1', is_active='false')
+        auth_manager.redis_client.delete(AuthManager.SESSION_INDEX_BACKFILL_KEY)
+
+        auth_manager._backfill_session_index()
+
+        assert auth_manager.redis_client.smembers('user_sessions:user-1') == {'legacy-1'}
+
+    def test_backfill_runs_once(self, auth_manager):
+        """Once the flag key is set, later backfills do not scan again"""
+        self._legacy_session(auth_manager, 'legacy-1', 'user-1')
+
+        auth_manager._backfill_session_index()
+
+        assert auth_manager.redis_client.exists(AuthManager.SESSION_INDEX_BACKFILL_KEY)
+        assert auth_manager.redis_client.smembers('user_sessions:user-1') == set()
+
+    def test_revoked_session_stays_out_of_index(self, auth_manager):
+        """After the last session is revoked the user has no sessions and the index stays empty"""
+        tokens = auth_manager.create_tokens('user-1', _fingerprint(auth_manager))
+        auth_manager.revoke_session(tokens['session_id'], 'user-1')
+
+        with patch.object(auth_manager.redis_client, 'scan_iter') as scan_iter:
+            assert auth_manager._get_user_sessions('user-1') == []
+        scan_iter.assert_not_called()
+        assert auth_manager.redis_client.smembers('user_sessions:user-1') == set()
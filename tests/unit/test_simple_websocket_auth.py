@@ -0,0 +1,130 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add the app directory to the Python path for CI/CD compatibility
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import pytest
+
+from app.utils import simple_websocket_auth
+from app.utils.simple_websocket_auth import SimpleWebSocketAuth, take_token, take_window_slot
+
+class FakeClock:
+    """Controllable stand-in for time.monotonic"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    """Empty limiter tables and a clock the test moves by hand."""
+    simple_websocket_auth._ws_buckets.clear()
+    simple_websocket_auth._ws_windows.clear()
+    fake_clock = FakeClock()
+    with patch.object(simple_websocket_auth.time, 'monotonic', fake_clock):
+        yield fake_clock
+    simple_websocket_auth._ws_buckets.clear()
+    simple_websocket_auth._ws_windows.clear()
+
+class TestTokenBucket:
+    """Test the in-process token bucket limiter"""
+
+    def test_allows_burst_up_to_capacity(self, clock):
+        """Exactly capacity events pass at once; the next one is refused"""
+        results = [take_token(('user', 'message'), 3, 60) for _ in range(4)]
+
+        assert results[:3] == [0.0, 0.0, 0.0]
+        assert results[3] == pytest.approx(20.0)  # One token refills every 60/3 seconds
+
+    def test_refills_one_token_per_interval(self, clock):
+        """A token becomes available exactly when its refill interval has passed"""
+        for _ in range(3):
+            take_token(('user', 'message'), 3, 60)
+
+        clock.now += 19.9
+        assert take_token(('user', 'message'), 3, 60) > 0.0
+        clock.now += 0.1
+        assert take_token(('user', 'message'), 3, 60) == 0.0
+        assert take_token(('user', 'message'), 3, 60) > 0.0
+
+    def test_refill_capped_at_capacity(self, clock):
+        """A long idle period does not bank more than capacity tokens"""
+        take_token(('user', 'message'), 3, 60)
+        clock.now += 3600
+
+        results = [take_token(('user', 'message'), 3, 60) for _ in range(4)]
+        assert results[:3] == [0.0, 0.0, 0.0]
+        assert results[3] > 0.0
+
+    def test_keys_are_independent(self, clock):
+        """Exhausting one user's bucket leaves other users and events untouched"""
+        for _ in range(2):
+            take_token(('user-1', 'message'), 2, 60)
+
+        assert take_token(('user-1', 'message'), 2, 60) > 0.0
+        assert take_token(('user-2', 'message'), 2, 60) == 0.0
+        assert take_token(('user-1', 'typing'), 2, 60) == 0.0
+
+    def test_table_pruned_when_full(self, clock):
+        """A full table drops idle buckets before adding a new key"""
+        with patch.object(simple_websocket_auth, 'RATE_LIMIT_MAX_KEYS', 10):
+            for i in range(10):
+                take_token((f'user-{i}', 'message'), 5, 60)
+            clock.now += 60
+            take_token(('user-new', 'message'), 5, 60)
+
+        assert list(simple_websocket_auth._ws_buckets) == [('user-new', 'message')]
+
+    def test_connection_limit_kept_per_namespace(self, clock):
+        """Connecting to one namespace does not use up another's allowance"""
+        auth = SimpleWebSocketAuth()
+        for _ in range(2):
+            assert auth.check_rate_limit('user', '2/minute', '/ws/chat')
+
+        assert not auth.check_rate_limit('user', '2/minute', '/ws/chat')
+        assert auth.check_rate_limit('user', '2/minute', '/ws/collaboration')
+
+class TestSlidingWindow:
+    """Test the bucketed sliding window limiter"""
+
+    def test_allows_limit_events_per_window(self, clock):
+        """Exactly limit events pass within a window; the next one is refused"""
+        clock.now = 1005.0
+        results = [take_window_slot(('user', 'message'), 3, 60) for _ in range(4)]
+
+        assert results[:3] == [0.0, 0.0, 0.0]
+        assert results[3] > 0.0
+
+    def test_slot_frees_when_oldest_sub_window_expires(self, clock):
+        """Events free up when their 10s sub-window leaves the six-sub-window span"""
+        clock.now = 1005.0  # Sub-window 1000-1010, counted until the 1060-1070 one starts
+        for _ in range(3):
+            take_window_slot(('user', 'message'), 3, 60)
+
+        clock.now = 1059.0
+        assert take_window_slot(('user', 'message'), 3, 60) == pytest.approx(1.0)
+        clock.now = 1060.0
+        assert take_window_slot(('user', 'message'), 3, 60) == 0.0
+
+    def test_burst_cannot_straddle_window_boundary(self, clock):
+        """A burst at the end of one minute still counts early in the next"""
+        clock.now = 1055.0
+        for _ in range(3):
+            take_window_slot(('user', 'message'), 3, 60)
+
+        clock.now = 1065.0
+        assert take_window_slot(('user', 'message'), 3, 60) > 0.0
+
+    def test_table_pruned_when_full(self, clock):
+        """A full table drops keys whose whole window has expired"""
+        with patch.object(simple_websocket_auth, 'RATE_LIMIT_MAX_KEYS', 10):
+            for i in range(10):
+                take_window_slot((f'user-{i}', 'message'), 5, 60)
+            clock.now += 70
+            take_window_slot(('user-new', 'message'), 5, 60)
+
+        assert list(simple_websocket_auth._ws_windows) == [('user-new', 'message')]
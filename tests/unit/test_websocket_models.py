@@ -0,0 +1,62 @@
+import os
+import sys
+
+# Add the app directory to the Python path for CI/CD compatibility
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from app.models.websocket_models import Room, RoomType, ROOM_CHANGE_LOG_SIZE
+
+def _room():
+    return Room(id='planning_test', name='Test', room_type=RoomType.PLANNING, created_by='user-1')
+
+class TestRoomChangesSince:
+    """Test delta sync from the room change log"""
+
+    def test_up_to_date_client_gets_no_changes(self):
+        """A client at the current version gets an empty delta"""
+        room = _room()
+        room.record_change('resource_locked', 'activity:1')
+
+        assert room.changes_since(room.version) == []
+
+    def test_returns_changes_after_version_in_order(self):
+        """Only changes newer than the client's version are returned, oldest first"""
+        room = _room()
+        for i in range(5):
+            room.record_change('resource_locked', f'activity:{i}')
+
+        changes = room.changes_since(2)
+        assert [change['version'] for change in changes] == [3, 4, 5]
+        assert changes[0]['key'] == 'activity:2'
+
+    def test_fresh_client_gets_whole_untrimmed_log(self):
+        """Version 0 is still covered while the log holds the first change"""
+        room = _room()
+        room.record_change('resource_locked', 'activity:1')
+
+        assert [change['version'] for change in room.changes_since(0)] == [1]
+
+    def test_trimmed_log_requires_full_snapshot(self):
+        """Once the log no longer reaches back to the client's version, None asks for a snapshot"""
+        room = _room()
+        total = ROOM_CHANGE_LOG_SIZE + 50
+        for i in range(total):
+            room.record_change('resource_locked', f'activity:{i}')
+        oldest_kept = total - ROOM_CHANGE_LOG_SIZE + 1
+
+        assert room.changes_since(0) is None
+        assert room.changes_since(oldest_kept - 2) is None
+        assert len(room.changes_since(oldest_kept - 1)) == ROOM_CHANGE_LOG_SIZE
+
+    def test_version_ahead_of_room_requires_full_snapshot(self):
+        """A client claiming a newer version than the room (e.g. after a restart) gets a snapshot"""
+        room = _room()
+        room.record_change('resource_locked', 'activity:1')
+
+        assert room.changes_since(room.version + 5) is None
+
+    def test_empty_room_log(self):
+        """A room with no changes is up to date at version 0"""
+        room = _room()
+
+        assert room.changes_since(0) == []
@@ -0,0 +1,149 @@
+import logging
+import os
+import sys
+from datetime import date, datetime
+from unittest.mock import Mock, patch
+
+# Add the app directory to the Python path for CI/CD compatibility
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import pytest
+from flask import Flask
+
+from app.config import TestingConfig
+from app.routes import weekly_planning
+from app.routes.weekly_planning import weekly_planning_bp, limiter
+from app.models.weekly_planning import WeeklyPlan
+
+BASE_URL = '/api/v1/weekly-planning'
+AUTH_HEADERS = {'Authorization': 'Bearer test-token'}
+
+@pytest.fixture
+def client():
+    """Weekly planning blueprint on a bare app with in-memory rate limits."""
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.register_blueprint(weekly_planning_bp)
+    limiter.init_app(app)
+
+    auth_service = Mock()
+    auth_service.verify_jwt_token.return_value = {
+        'valid': True,
+        'user': {'uid': 'user-1', 'role': 'teacher'}
+    }
+    with patch('app.utils.auth_middleware._get_auth_service', return_value=auth_service):
+        yield app.test_client()
+
+class TestRateLimits:
+    """Test route rate limits on the weekly planning blueprint"""
+
+    def test_initialize_templates_limited_to_five_per_hour(self, client):
+        """The sixth template initialization in an hour is rejected"""
+        template_service = Mock()
+        template_service.initialize_default_templates.return_value = True
+
+        with patch.object(weekly_planning, '_template_service', return_value=template_service):
+            statuses = [
+                client.post(f'{BASE_URL}/system/initialize-templates', headers=AUTH_HEADERS).status_code
+                for _ in range(6)
+            ]
+
+        assert statuses == [200] * 5 + [429]
+        assert template_service.initialize_default_templates.call_count == 5
+
+class TestParseDate:
+    """Test strict YYYY-MM-DD parsing of query parameters"""
+
+    def test_valid_date(self):
+        """A well-formed calendar date is parsed"""
+        assert weekly_planning.parse_date('2024-02-29') == date(2024, 2, 29)
+
+    @pytest.mark.parametrize('value', [
+        '2024-2-01',     # Unpadded month
+        '2024-02-1',     # Unpadded day
+        '2024-02-30',    # Not a calendar date
+        '2023-02-29',    # Not a leap year
+        'abcd-ef-gh',    # Right shape, not digits
+        '2024/02/01',    # Wrong separators
+        '2024-02-011',   # Too long
+        '',
+        None,
+    ])
+    def test_invalid_dates_rejected(self, value):
+        """Malformed or impossible dates give None instead of raising"""
+        assert weekly_planning.parse_date(value) is None
+
+class TestConditionalRequests:
+    """Test ETag / If-None-Match handling on cacheable reads"""
+
+    def _planning_service(self, plan=None, templates=None):
+        service = Mock()
+        service.get_weekly_plan_by_id.return_value = plan
+        service.get_templates.return_value = templates
+        return patch.object(weekly_planning, '_planning_service', return_value=service)
+
+    def test_plan_not_modified(self, client):
+        """A matching If-None-Match on a plan gives an empty 304 carrying the same ETag"""
+        plan = WeeklyPlan(id='plan-1', title='Week 1', user_id='user-1',
+                          updated_at=datetime(2024, 2, 5, 9, 30))
+
+        with self._planning_service(plan=plan):
+            first = client.get(f'{BASE_URL}/plans/plan-1', headers=AUTH_HEADERS)
+            etag = first.headers['ETag']
+            second = client.get(f'{BASE_URL}/plans/plan-1',
+                                headers={**AUTH_HEADERS, 'If-None-Match': etag})
+
+        assert first.status_code == 200
+        assert first.get_json()['data']['id'] == 'plan-1'
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == etag
+
+    def test_plan_changed_after_update(self, client):
+        """Once the plan's update time moves on, the old ETag gets a full 200"""
+        plan = WeeklyPlan(id='plan-1', user_id='user-1', updated_at=datetime(2024, 2, 5, 9, 30))
+
+        with self._planning_service(plan=plan):
+            etag = client.get(f'{BASE_URL}/plans/plan-1', headers=AUTH_HEADERS).headers['ETag']
+            plan.updated_at = datetime(2024, 2, 5, 10, 0)
+            response = client.get(f'{BASE_URL}/plans/plan-1',
+                                  headers={**AUTH_HEADERS, 'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.get_json()['success'] is True
+
+    def test_templates_not_modified(self, client):
+        """Template lists are tagged by body hash and revalidate to an empty 304"""
+        templates = [{'id': 'template-1', 'title': 'Maths week'}]
+
+        with self._planning_service(templates=templates):
+            first = client.get(f'{BASE_URL}/templates', headers=AUTH_HEADERS)
+            etag = first.headers['ETag']
+            second = client.get(f'{BASE_URL}/templates',
+                                headers={**AUTH_HEADERS, 'If-None-Match': etag})
+
+        assert first.status_code == 200
+        assert first.get_json()['data'] == templates
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == etag
+
+class TestErrorHandling:
+    """Test the blueprint-wide handler for unexpected route errors"""
+
+    def test_unhandled_error_hides_details_and_logs_traceback(self, client, caplog):
+        """An unexpected exception gives a generic 500 and is logged with its traceback"""
+        service = Mock()
+        service.get_weekly_plan_by_id.side_effect = RuntimeError('firestore password=secret')
+
+        with patch.object(weekly_planning, '_planning_service', return_value=service), \
+             caplog.at_level(logging.ERROR, logger=weekly_planning.logger.name):
+            response = client.get(f'{BASE_URL}/plans/plan-1', headers=AUTH_HEADERS)
+
+        assert response.status_code == 500
+        body = response.get_json()
+        assert body['success'] is False
+        assert 'details' not in body
+        assert 'secret' not in response.get_data(as_text=True)
+        assert caplog.records[-1].exc_info[0] is RuntimeError